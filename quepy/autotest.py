@@ -0,0 +1,148 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Checks that the examples in the docstrings of the question templates of an
+app match their template.
+
+All the examples are tagged in a single batch (optionally remembering the
+tags on disk) and matched by a pool of worker processes, each one with its
+own installed copy of the app.
+"""
+
+import re
+import time
+from collections import namedtuple
+
+from quepy.quepyapp import install
+from quepy.parallel import make_pool, chunks
+from quepy.parsing import QuestionTemplate
+from quepy.tagger import Tagger, get_backend
+from quepy.cache import DiskCache
+from quepy.encodingpolicy import encoding_flexible_conversion
+
+_example_re = re.compile('"(.*?)"')
+_templates = {}  # App name to its template instances by name, per process
+
+Result = namedtuple("Result", "template text words ok seconds")
+
+
+def get_examples(parsing_module):
+    """
+    Returns a dict from the name of every `QuestionTemplate` subclass of
+    `parsing_module` with examples to the list of examples of its docstring.
+    """
+    examples = {}
+    for attr_name in dir(parsing_module):
+        attr = getattr(parsing_module, attr_name)
+        try:
+            if not issubclass(attr, QuestionTemplate):
+                continue
+        except TypeError:
+            continue
+        found = _example_re.findall(attr.__doc__ or "")
+        if found:
+            examples[attr.__name__] = found
+    return examples
+
+
+def _get_parsing_module(app_name):
+    return __import__("{0}.parsing".format(app_name), fromlist=[None])
+
+
+def _get_templates(app_name, parsing_module=None):
+    templates = _templates.get(app_name)
+    if templates is None:
+        if parsing_module is None:
+            parsing_module = _get_parsing_module(app_name)
+        templates = {}
+        for name in get_examples(parsing_module):
+            templates[name] = getattr(parsing_module, name)()
+        _templates[app_name] = templates
+    return templates
+
+
+def match_examples(templates, items):
+    """
+    Matches every ``(template name, words)`` pair of `items` against the
+    template of that name in `templates`.
+    Returns a list of ``(ok, seconds)`` pairs.
+    """
+    results = []
+    for name, words in items:
+        start = time.time()
+        ok = templates[name].match(words) is not None
+        results.append((ok, time.time() - start))
+    return results
+
+
+def _match_chunk(args):
+    app_name, items = args
+    return match_examples(_get_templates(app_name), items)
+
+
+def run(app_name, jobs=None, cache_path=None, chunksize=50):
+    """
+    Tags and matches all the examples of the app `app_name` using `jobs`
+    processes (defaults to the number of CPUs).
+    If `cache_path` is given the tags are remembered in that file, keyed
+    by the text of the example and the version of the tagger.
+    Returns a list of `Result`, sorted by template and example.
+    """
+    install(app_name)
+    parsing_module = _get_parsing_module(app_name)
+    templates = _get_templates(app_name, parsing_module)
+    examples = get_examples(parsing_module)
+    pairs = [(name, encoding_flexible_conversion(text))
+             for name in sorted(examples) for text in examples[name]]
+
+    backend = get_backend()
+    cache = None
+    if cache_path is not None:
+        cache = DiskCache(cache_path, backend.version())
+    tagger = Tagger(backend.tag, cache, backend.tag_many, backend.warmup)
+    tagged = tagger.tag_many([text for _, text in pairs])
+    if cache is not None:
+        cache.save()
+
+    items = [(name, words) for (name, _), words in zip(pairs, tagged)]
+    if jobs == 1 or len(items) <= chunksize:
+        matches = match_examples(templates, items)
+    else:
+        pool = make_pool(app_name, jobs)
+        try:
+            matches = []
+            pieces = ((app_name, chunk) for chunk in chunks(items, chunksize))
+            for chunk in pool.imap(_match_chunk, pieces):
+                matches.extend(chunk)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    return [Result(name, text, words, ok, seconds)
+            for (name, text), words, (ok, seconds)
+            in zip(pairs, tagged, matches)]
+
+
+def template_timings(results):
+    """
+    Returns a list of ``(template name, examples, seconds)`` with the total
+    matching time of each template, the slowest first.
+    """
+    totals = {}
+    for result in results:
+        count, seconds = totals.get(result.template, (0, 0.0))
+        totals[result.template] = count + 1, seconds + result.seconds
+    timings = [(name, count, seconds)
+               for name, (count, seconds) in totals.iteritems()]
+    timings.sort(key=lambda x: (-x[2], x[0]))
+    return timings
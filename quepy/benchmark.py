@@ -0,0 +1,177 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Benchmarks of the throughput of quepy.
+
+`bench_app` times every stage of the translation of a list of questions
+(tagging, matching each rule, interpretation and code generation) and
+`bench_generators` times the code generators on random expressions of
+growing size. Both return dicts that can be dumped as JSON, with the times
+in milliseconds.
+"""
+
+import math
+import random
+import string
+import time
+
+from quepy import generation
+from quepy.tagger import Tagger, get_backend
+from quepy.random_expression import random_large_expression
+
+LANGUAGES = ("sparql", "mql", "dot")
+PERCENTILES = (50, 90, 99)
+# Characters of the random expressions, valid for every language
+_ALPHABET = string.ascii_letters + string.digits
+
+
+def percentile(samples, n):
+    """
+    Returns the `n` percentile of the sorted list `samples` (nearest rank).
+    """
+    if not samples:
+        return None
+    rank = int(math.ceil(n / 100.0 * len(samples))) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+def summarize(samples):
+    """
+    Returns a dict with the count, mean, percentiles and maximum of the
+    list of times in seconds `samples`, in milliseconds.
+    """
+    samples = sorted(x * 1000.0 for x in samples)
+    summary = {u"count": len(samples)}
+    if samples:
+        summary[u"mean"] = sum(samples) / len(samples)
+        summary[u"max"] = samples[-1]
+    for n in PERCENTILES:
+        summary[u"p{}".format(n)] = percentile(samples, n)
+    return summary
+
+
+class Timings(object):
+    """
+    Collects the times of named stages.
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        return {stage: summarize(samples)
+                for stage, samples in self.samples.iteritems()}
+
+
+def bench_app(app, questions, languages=LANGUAGES, repeat=1):
+    """
+    Translates the unicode strings of `questions` `repeat` times with the
+    installed `app` timing every stage and returns a dict with:
+
+    - ``stages``: the summary of the times of each question for tagging
+      (without cache), matching, interpretation, generation in each one of
+      `languages` and the whole translation.
+    - ``rules``: the summary of the times of matching each rule.
+    - ``questions_per_second``: the throughput of the whole translation.
+    """
+    backend = get_backend()
+    tagger = Tagger(backend.tag)
+    tagger.warmup()
+    app.warmup()
+
+    stages = Timings()
+    rules = Timings()
+    total = 0.0
+    for _ in xrange(repeat):
+        for question in questions:
+            start = time.time()
+            words = tagger(question)
+            tagging = time.time() - start
+            stages.add(u"tagging", tagging)
+
+            start = time.time()
+            matches = app.get_matches(words)
+            matching = time.time() - start
+            stages.add(u"matching", matching)
+
+            start = time.time()
+            interpretations = {}
+            expressions = []
+            for rule, match in matches:
+                expression, _ = rule.get_match_interpretation(
+                    match, words, interpretations)
+                if expression:
+                    expressions.append(expression)
+            interpretation = time.time() - start
+            stages.add(u"interpretation", interpretation)
+
+            elapsed = tagging + matching + interpretation
+            for language in languages:
+                start = time.time()
+                for expression in expressions:
+                    generation.get_code(expression, language)
+                seconds = time.time() - start
+                stages.add(u"generation:" + language, seconds)
+                elapsed += seconds
+            stages.add(u"question", elapsed)
+            total += elapsed
+
+            # Every rule on its own, without the rule index
+            for rule in app.rules:
+                start = time.time()
+                rule.match(words)
+                rules.add(rule.__class__.__name__, time.time() - start)
+
+    count = len(questions) * repeat
+    return {
+        u"questions": count,
+        u"questions_per_second": count / total if total else None,
+        u"stages": stages.summary(),
+        u"rules": rules.summary(),
+    }
+
+
+def bench_generators(sizes=(10, 100, 1000), count=20, languages=LANGUAGES,
+                     seed=0):
+    """
+    Times the code generation of `count` random expressions of at least
+    each one of `sizes` nodes in each one of `languages`.
+    The expressions are the same for the same `seed`.
+    Returns a dict from language to a dict from size to the summary of the
+    times, that also includes the mean amount of ``nodes``.
+    """
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        expressions = {}
+        for size in sizes:
+            expressions[size] = [random_large_expression(size,
+                                                         alphabet=_ALPHABET)
+                                 for _ in xrange(count)]
+    finally:
+        random.setstate(state)
+
+    result = {}
+    for language in languages:
+        result[language] = {}
+        for size in sizes:
+            samples = []
+            for expression in expressions[size]:
+                start = time.time()
+                generation.get_code(expression, language)
+                samples.append(time.time() - start)
+            summary = summarize(samples)
+            nodes = sum(len(x) for x in expressions[size])
+            summary[u"nodes"] = nodes / float(count)
+            result[language][unicode(size)] = summary
+    return result
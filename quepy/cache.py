@@ -0,0 +1,169 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Caching utilities.
+
+Anything that quepy memoises takes a *cache* object, which is anything with
+a ``get(key)`` method returning ``None`` on a miss and a ``set(key, value)``
+method. ``LRUCache`` is the default implementation.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def atomic_write(path, data):
+    """
+    Writes the str `data` to the file `path` through a temporary file that
+    is renamed over it, so a concurrent reader never sees half of it.
+    The temporary file is removed if the write fails.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as filehandler:
+            filehandler.write(data)
+        os.rename(temporary, path)
+    except:
+        os.remove(temporary)
+        raise
+
+
+class LRUCache(object):
+    """
+    Bounded mapping that discards the least recently used entries.
+    Optionally entries expire `ttl` seconds after being stored.
+    Keeps count of `hits` and `misses`.
+    """
+
+    def __init__(self, size=1024, ttl=None, clock=time.time):
+        if size < 1:
+            raise ValueError(u"Cache size must be positive")
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for `key` or `default` if there is no such
+        value (or it expired).
+        """
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= self._clock():
+                self.misses += 1
+                return default
+            self._data[key] = value, expires
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Stores `value` for `key`, discarding the least recently used entry if
+        the cache is full.
+        """
+        expires = None
+        if self.ttl is not None:
+            expires = self._clock() + self.ttl
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value, expires
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry (counters are kept).
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Returns a dict with the counters and the current size of the cache.
+        """
+        return {u"hits": self.hits, u"misses": self.misses,
+                u"size": len(self._data), u"maxsize": self.size}
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache(object):
+    """
+    Cache of JSON serializable values stored in the file `path`.
+    Only the entries of the given `version` are kept, so the entries stored
+    by other versions of whatever filled the cache are discarded.
+    Changes are written to disk on `save`.
+    """
+
+    def __init__(self, path, version=u""):
+        self.path = path
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(path) as filehandler:
+                stored = json.load(filehandler)
+        except (IOError, ValueError):
+            stored = {}
+        if stored.get(u"version") == version:
+            self._data = stored.get(u"entries", {})
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for `key` or `default` if there is no such
+        value.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Stores `value` for `key`.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._dirty = True
+
+    def save(self):
+        """
+        Writes the entries to disk (see `atomic_write`) if they changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            atomic_write(self.path, json.dumps({u"version": self.version,
+                                                u"entries": self._data}))
+            self._dirty = False
+
+    def __len__(self):
+        return len(self._data)
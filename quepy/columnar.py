@@ -0,0 +1,93 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Columnar representation of tagged sentences.
+
+The strings that the rules look for are interned to small integers in a
+`Vocabulary` and a `ColumnarSentence` keeps, besides its words, the ids of
+their tokens, lemmas and POS tags in parallel arrays. Compiled programs
+(see `quepy.matcher`) match them comparing integers instead of strings.
+"""
+
+from array import array
+from itertools import izip
+
+from quepy.parsing import WordList
+
+UNKNOWN = -1  # Id of the strings that are not in the vocabulary
+
+# Attributes of the words stored in columns, in row order.
+COLUMNS = (u"token", u"lemma", u"pos")
+
+
+class Vocabulary(object):
+    """
+    Mapping from strings to consecutive integer ids.
+    """
+
+    def __init__(self, strings=()):
+        self.strings = []
+        self._ids = {}
+        for string in strings:
+            self.add(string)
+
+    def add(self, string):
+        """
+        Returns the id of `string`, adding it if it's not in the vocabulary.
+        """
+        try:
+            return self._ids[string]
+        except KeyError:
+            self._ids[string] = len(self.strings)
+            self.strings.append(string)
+            return self._ids[string]
+
+    def get(self, string):
+        """
+        Returns the id of `string` or `UNKNOWN`.
+        """
+        return self._ids.get(string, UNKNOWN)
+
+    def __contains__(self, string):
+        return string in self._ids
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class ColumnarSentence(WordList):
+    """
+    A list of words plus the ids of their tokens, lemmas and POS tags in
+    `vocabulary`.
+    The ids are taken when the sentence is built, strings added to the
+    vocabulary afterwards are unknown for it (see `is_current`).
+    """
+
+    def __init__(self, words, vocabulary):
+        super(ColumnarSentence, self).__init__(words)
+        self.vocabulary = vocabulary
+        self.size = len(vocabulary)
+        get = vocabulary.get
+        self.token_ids = array("i", [get(word.token) for word in self])
+        self.lemma_ids = array("i", [get(word.lemma) for word in self])
+        self.pos_ids = array("i", [get(word.pos) for word in self])
+
+    def is_current(self, vocabulary):
+        """
+        Returns ``True`` if the ids of the sentence are valid for
+        `vocabulary` in its current state.
+        """
+        return vocabulary is self.vocabulary and self.size == len(vocabulary)
+
+    def rows(self):
+        """
+        Iterates over the tuples of ids of each word, ordered as `COLUMNS`.
+        """
+        return izip(self.token_ids, self.lemma_ids, self.pos_ids)
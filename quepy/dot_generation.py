@@ -4,8 +4,10 @@
 Dot generation code.
 """
 
-import random
+from itertools import count
+
 from quepy.expression import isnode
+from quepy.traversal import get_traversal
 from quepy.dsl import IsRelatedTo, HasKeyword
 from quepy.encodingpolicy import assert_valid_encoding
 
@@ -39,23 +41,31 @@ def adapt(x):
 
 
 def expression_to_dot(e):
-    d = {u"rdf:type": dot_type,
-         HasKeyword.relation: dot_keyword,
-         IsRelatedTo: lambda x, y: dot_arc(x, u"", y)}
-    s = u"digraph G {{\n{0} [shape=house];\n{1}\n}}\n"
-    xs = []
-    for node in e.iter_nodes():
-        for relation, other in e.iter_edges(node):
-            node1 = adapt(node)
-            node2 = adapt(other)
-            relation = escape(relation, add_quotes=False)
-
-            if relation in d:
-                x = d[relation](node1, node2)
-            else:
-                x = dot_arc(node1, relation, node2)
-            xs.append(x)
-    return None, s.format(adapt(e.head), u"".join(xs))
+    """
+    Returns the pair ``(None, dot)`` with the graph of the expression `e`
+    in the dot language.
+    The output only depends on `e`: blank nodes are numbered in order.
+    """
+    blanks = count()
+    keyword = escape(HasKeyword.relation, add_quotes=False)
+    out = [u"digraph G {\n", adapt(e.get_head()), u" [shape=house];\n"]
+    for node, relation, other in get_traversal(e).edges:
+        node1 = adapt(node)
+        node2 = adapt(other)
+        if relation is IsRelatedTo:
+            out.append(dot_arc(node1, u"", node2))
+            continue
+
+        relation = escape(relation, add_quotes=False)
+        if relation == keyword:
+            blank = u"blank{}".format(next(blanks))
+            out.append(dot_keyword(node1, node2, blank))
+        elif relation in _dispatch:
+            out.append(_dispatch[relation](node1, node2))
+        else:
+            out.append(dot_arc(node1, relation, node2))
+    out.append(u"\n}\n")
+    return None, u"".join(out)
 
 
 def dot_arc(a, label, b):
@@ -69,21 +79,35 @@ def dot_type(a, t):
     return s + u"{0} -> {1} [color=red, arrowhead=empty];".format(a, t)
 
 
-def dot_attribute(a, key):
-    blank = id(a)
+def _blank(blank):
+    if blank is None:
+        blank = u"blank{}".format(next(_blanks))
+    return blank
+
+
+def dot_attribute(a, key, blank=None):
+    blank = _blank(blank)
     s = u"{0} [shape=none label={1}];\n".format(blank, key)
     return s + u"{0} -> {1};".format(a, blank)
 
 
-def dot_keyword(a, key):
-    blank = u"{0:.30f}".format(random.random())
-    blank = u"blank" + blank.replace(u".", u"")
+def dot_keyword(a, key, blank=None):
+    blank = _blank(blank)
     s = u"{0} [shape=none label={1}];\n".format(blank, key)
     return s + u"{0} -> {1} [style=dashed];".format(a, blank)
 
 
-def dot_fixed_type(a, fixedtype):
-    blank = u"{0:.30f}".format(random.random())
-    blank = u"blank" + blank.replace(u".", u"")
+def dot_fixed_type(a, fixedtype, blank=None):
+    blank = _blank(blank)
     s = u"{0} [shape=box label={1}];\n".format(blank, fixedtype)
     return s + u"{0} -> {1} [color=red, arrowhead=empty];".format(a, blank)
+
+
+# Relations drawn in a special way, besides `IsRelatedTo` and the
+# relation of `HasKeyword` (that can be changed by the apps).
+_dispatch = {
+    u"rdf:type": dot_type,
+}
+
+# Names for the blank nodes made outside of `expression_to_dot`.
+_blanks = count()
@@ -12,7 +12,6 @@
 Domain specific language definitions.
 """
 
-from copy import copy
 from quepy.expression import Expression
 from quepy.encodingpolicy import encoding_flexible_conversion
 
@@ -33,8 +32,7 @@ class FixedRelation(Expression):
         if self.relation is None:
             raise ValueError("You *must* define the `relation` "
                              "class attribute to use this class.")
-        self.nodes = copy(destination.nodes)
-        self.head = destination.head
+        self._share_graph(destination)
         self.decapitate(self.relation, reverse)
 
 
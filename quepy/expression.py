@@ -85,11 +85,21 @@ The reasons are:
     - There are just 3 really basic operations and their semantics are defined
       concisely without special cases (if you care for that kind of stuff
       (I do)).
+
+Copies of an ``Expression`` (like the ones ``+`` makes) share the edge lists
+of their nodes, and a list is copied only when one of them adds an edge to
+it. So ``a + b`` costs about the size of ``b`` instead of the size of both.
 """
 
 
+from array import array
+from itertools import count
 from collections import defaultdict
-from copy import deepcopy
+from copy import copy
+
+# Every modification of an expression gives it a new version number, so
+# anything computed from a version stays valid while the number is the same.
+_versions = count()
 
 
 def isnode(x):
@@ -103,6 +113,7 @@ class Expression(object):
         Creates a new graph with a single solitary blank node.
         """
         self.nodes = []
+        self._owned = set()  # Nodes whose edge list is not shared
         self.head = self._add_node()
 
     def _add_node(self):
@@ -112,8 +123,32 @@ class Expression(object):
         """
         i = len(self.nodes)
         self.nodes.append([])
+        self._owned.add(i)
+        self.version = next(_versions)
         return i
 
+    def _edges(self, node):
+        """
+        Returns the list of edges of `node` to add edges to, copying it
+        first if it's shared with another Expression.
+        """
+        if node not in self._owned:
+            self.nodes[node] = list(self.nodes[node])
+            self._owned.add(node)
+        self.version = next(_versions)
+        return self.nodes[node]
+
+    def _share_graph(self, other):
+        """
+        Makes the graph of this Expression a copy of the graph of `other`.
+        Edge lists are shared until one of them modifies them.
+        """
+        self.nodes = list(other.nodes)
+        self.head = other.head
+        self._owned = set()
+        self.version = other.version
+        other._owned = set()
+
     def get_head(self):
         """
         Returns the index (the unique identifier) of the head node.
@@ -131,7 +166,7 @@ class Expression(object):
         translation[other.head] = self.head
         for node in other.iter_nodes():
             for relation, dest in other.iter_edges(node):
-                xs = self.nodes[translation[node]]
+                xs = self._edges(translation[node])
                 if isnode(dest):
                     dest = translation[dest]
                 xs.append((relation, dest))
@@ -149,9 +184,9 @@ class Expression(object):
         oldhead = self.head
         self.head = self._add_node()
         if reverse:
-            self.nodes[oldhead].append((relation, self.head))
+            self._edges(oldhead).append((relation, self.head))
         else:
-            self.nodes[self.head].append((relation, oldhead))
+            self._edges(self.head).append((relation, oldhead))
 
     def add_data(self, relation, value):
         """
@@ -168,7 +203,7 @@ class Expression(object):
         To relate nodes in a graph use a combination of merge and decapitate.
         """
         assert not isnode(value)
-        self.nodes[self.head].append((relation, value))
+        self._edges(self.head).append((relation, value))
 
     def iter_nodes(self):
         """
@@ -191,10 +226,20 @@ class Expression(object):
         Merges ``self`` and ``other`` in a new Expression instance.
         Ie, ``self`` and ``other`` are not modified.
         """
-        new = deepcopy(self)
+        new = copy(self)
         new.merge(other)
         return new
 
+    def __copy__(self):
+        """
+        Returns a new Expression with the same graph (and attributes) as
+        ``self``, modifying any of them doesn't modify the other.
+        """
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new._share_graph(self)
+        return new
+
     def __iadd__(self, other):
         """
         Merges ``self`` and ``other`` into ``self``
@@ -208,3 +253,194 @@ class Expression(object):
         Amount of nodes in the graph.
         """
         return len(self.nodes)
+
+
+# Relations of every CompactExpression, so they share their ids.
+_relations = []
+_relation_ids = {}
+
+
+def _relation_id(relation):
+    try:
+        return _relation_ids[relation]
+    except KeyError:
+        _relation_ids[relation] = len(_relations)
+        _relations.append(relation)
+        return _relation_ids[relation]
+
+
+class CompactExpression(object):
+    """
+    An ``Expression`` that stores its edges in flat arrays.
+
+    Each edge ``i`` goes from node ``sources[i]`` through the relation with
+    id ``relations[i]`` (relations are interned for all instances) to
+    ``dests[i]``. Destinations that are not negative are node indexes, and
+    ``-k - 1`` stands for the ``k``-th entry of the table of `literals`.
+
+    It has the same API as ``Expression`` (and can be merged with one) but
+    uses much less memory, and merging two of them appends their arrays
+    instead of translating their edges one by one.
+    """
+
+    def __init__(self):
+        """
+        Creates a new graph with a single solitary blank node.
+        """
+        self.sources = array("i")
+        self.relations = array("i")
+        self.dests = array("i")
+        self.literals = []
+        self.head = 0
+        self._size = 1
+        self._adjacency = None
+        self.version = next(_versions)
+
+    @classmethod
+    def from_expression(cls, expression):
+        """
+        Returns a ``CompactExpression`` with the same graph as `expression`.
+        """
+        new = cls()
+        new.merge(expression)
+        rule_used = getattr(expression, "rule_used", None)
+        if rule_used is not None:
+            new.rule_used = rule_used
+        return new
+
+    def _add_node(self):
+        i = self._size
+        self._size += 1
+        self.version = next(_versions)
+        return i
+
+    def _add_edge(self, source, relation, dest):
+        if not isnode(dest):
+            self.literals.append(dest)
+            dest = -len(self.literals)
+        self.sources.append(source)
+        self.relations.append(_relation_id(relation))
+        self.dests.append(dest)
+        self._adjacency = None
+        self.version = next(_versions)
+
+    def get_head(self):
+        """
+        Returns the index (the unique identifier) of the head node.
+        """
+        return self.head
+
+    def merge(self, other):
+        """
+        Given other Expression, it joins their graphs preserving every
+        node and every edge intact except for the ``head`` nodes.
+        The ``head`` nodes are merged into a single node that is the new
+        ``head`` and shares all the edges of the previous heads.
+        """
+        if not isinstance(other, CompactExpression):
+            translation = defaultdict(self._add_node)
+            translation[other.get_head()] = self.head
+            for node in other.iter_nodes():
+                for relation, dest in other.iter_edges(node):
+                    if isnode(dest):
+                        dest = translation[dest]
+                    self._add_edge(translation[node], relation, dest)
+            return
+
+        # Nodes keep their order, other's head is dropped.
+        offset = self._size
+        head = other.head
+        translation = range(offset, offset + head) + [self.head] + \
+            range(offset + head, offset + len(other) - 1)
+        nliterals = len(self.literals)
+
+        self.sources.extend(array("i", [translation[x]
+                                        for x in other.sources]))
+        self.relations.extend(other.relations)
+        self.dests.extend(array("i", [translation[x] if x >= 0
+                                      else x - nliterals
+                                      for x in other.dests]))
+        self.literals.extend(other.literals)
+        self._size += len(other) - 1
+        self._adjacency = None
+        self.version = next(_versions)
+
+    def decapitate(self, relation, reverse=False):
+        """
+        Creates a new blank node and makes it the ``head`` of the
+        Expression. Then it adds an edge (a ``relation``) linking the
+        the new head to the old one.
+        If ``reverse`` is ``True`` then the ``relation`` links the old head to
+        the new head instead of the opposite.
+        """
+        oldhead = self.head
+        self.head = self._add_node()
+        if reverse:
+            self._add_edge(oldhead, relation, self.head)
+        else:
+            self._add_edge(self.head, relation, oldhead)
+
+    def add_data(self, relation, value):
+        """
+        Adds a ``relation`` to some constant ``value`` to the ``head`` of the
+        Expression. See ``Expression.add_data``.
+        """
+        assert not isnode(value)
+        self._add_edge(self.head, relation, value)
+
+    def iter_nodes(self):
+        """
+        Iterates the indexes (the unique identifiers) of the Expression nodes.
+        """
+        return xrange(self._size)
+
+    def iter_edges(self, node):
+        """
+        Iterates over the pairs: ``(relation, index)`` which are the neighbors
+        of ``node`` in the expression graph (see ``Expression.iter_edges``).
+        """
+        if self._adjacency is None:
+            adjacency = [[] for _ in xrange(self._size)]
+            for i, source in enumerate(self.sources):
+                adjacency[source].append(i)
+            self._adjacency = adjacency
+        relations = self.relations
+        dests = self.dests
+        literals = self.literals
+        for i in self._adjacency[node]:
+            dest = dests[i]
+            if dest < 0:
+                dest = literals[-dest - 1]
+            yield _relations[relations[i]], dest
+
+    def __add__(self, other):
+        """
+        Merges ``self`` and ``other`` in a new Expression instance.
+        Ie, ``self`` and ``other`` are not modified.
+        """
+        new = copy(self)
+        new.merge(other)
+        return new
+
+    def __iadd__(self, other):
+        """
+        Merges ``self`` and ``other`` into ``self``
+        ``other`` is not modified but the original data in ``self`` is lost.
+        """
+        self.merge(other)
+        return self
+
+    def __copy__(self):
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.sources = array("i", self.sources)
+        new.relations = array("i", self.relations)
+        new.dests = array("i", self.dests)
+        new.literals = list(self.literals)
+        return new
+
+    def __len__(self):
+        """
+        Amount of nodes in the graph.
+        """
+        return self._size
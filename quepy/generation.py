@@ -16,6 +16,9 @@ The currently supported languages are:
     * Dot: generation of graph images mainly for debugging.
 """
 
+import time
+
+from quepy import metrics
 from quepy.mql_generation import generate_mql
 from quepy.dot_generation import expression_to_dot
 from quepy.sparql_generation import expression_to_sparql
@@ -27,6 +30,16 @@ def get_code(expression, language):
     returns the query for that expression on that language.
     """
 
+    if not metrics.collecting():
+        return _get_code(expression, language)
+    start = time.time()
+    result = _get_code(expression, language)
+    metrics.timing(u"generation", time.time() - start,
+                   {u"language": unicode(language)})
+    return result
+
+
+def _get_code(expression, language):
     if language == "sparql":
         return expression_to_sparql(expression)
     elif language == "dot":
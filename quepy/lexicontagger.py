@@ -0,0 +1,133 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tagging using a precomputed lexicon.
+
+The lexicon maps every known token to its most likely POS tag and lemma.
+It's learned from a list of questions with `build_lexicon`, usually the
+question logs of the app. Questions with tokens missing from the lexicon are
+tagged with NLTK.
+"""
+
+import os
+import json
+import hashlib
+from collections import defaultdict, Counter
+
+import nltk
+from quepy import settings
+from quepy.tagger import Word, TaggerBackend
+from quepy.nltktagger import NLTKBackend
+
+
+def build_lexicon(questions, backend=None):
+    """
+    Tags every unicode string of `questions` with `backend` (defaults to
+    NLTK) and returns a lexicon: a dict from token to the pair ``(pos,
+    lemma)`` most seen for it.
+    """
+    if backend is None:
+        backend = NLTKBackend()
+    counts = defaultdict(Counter)
+    for words in backend.tag_many(list(questions)):
+        for word in words:
+            counts[word.token][word.pos, word.lemma] += 1
+
+    lexicon = {}
+    for token, counter in counts.iteritems():
+        (pos, lemma), _ = counter.most_common(1)[0]
+        lexicon[token] = pos, lemma
+    return lexicon
+
+
+def save_lexicon(lexicon, path):
+    """
+    Saves `lexicon` as a JSON file in `path`.
+    """
+    with open(path, "w") as filehandler:
+        json.dump(lexicon, filehandler, sort_keys=True, indent=0)
+
+
+def load_lexicon(path):
+    """
+    Loads a lexicon saved with `save_lexicon`.
+    """
+    with open(path) as filehandler:
+        data = json.load(filehandler)
+    return {token: tuple(entry) for token, entry in data.iteritems()}
+
+
+class LexiconBackend(TaggerBackend):
+    """
+    Tagger backend that looks up every token in a lexicon and falls back to
+    `fallback` (defaults to NLTK) if some token is unknown.
+    The lexicon is loaded from the path in the `TAGGER_LEXICON` setting
+    unless `lexicon` is given.
+    """
+
+    def __init__(self, lexicon=None, fallback=None):
+        if fallback is None:
+            fallback = NLTKBackend()
+        self.fallback = fallback
+        self.lexicon = lexicon
+        self._path = None  # Path of the lexicon loaded from the settings
+
+    def _get_lexicon(self):
+        if self.lexicon is None or self._path is not None:
+            path = getattr(settings, "TAGGER_LEXICON", None)
+            if not path:
+                raise ValueError(u"Missing configuration for TAGGER_LEXICON")
+            if path != self._path:
+                self.lexicon = load_lexicon(path)
+                self._path = path
+        return self.lexicon
+
+    def _lookup(self, lexicon, string):
+        tokens = nltk.wordpunct_tokenize(string)
+        try:
+            entries = [lexicon[token] for token in tokens]
+        except KeyError:
+            return None
+        return [Word(token, lemma, pos)
+                for token, (pos, lemma) in zip(tokens, entries)]
+
+    def tag(self, string):
+        words = self._lookup(self._get_lexicon(), string)
+        if words is None:
+            # The POS of a token depends on its context, so the whole
+            # question is tagged again.
+            return self.fallback.tag(string)
+        return words
+
+    def tag_many(self, strings):
+        lexicon = self._get_lexicon()
+        result = [self._lookup(lexicon, string) for string in strings]
+        unknown = [i for i, words in enumerate(result) if words is None]
+        if unknown:
+            # Questions with unknown tokens are tagged in a single batch
+            tagged = self.fallback.tag_many([strings[i] for i in unknown])
+            for i, words in zip(unknown, tagged):
+                result[i] = words
+        return result
+
+    def warmup(self):
+        self._get_lexicon()
+        self.fallback.warmup()
+
+    def version(self):
+        if self.lexicon is not None and self._path is None:
+            data = json.dumps(self.lexicon, sort_keys=True)
+            lexicon = hashlib.sha1(data).hexdigest()
+        else:
+            path = getattr(settings, "TAGGER_LEXICON", None)
+            mtime = os.path.getmtime(path) if path else None
+            lexicon = u"{} {}".format(path, mtime)
+        return u"cached-lexicon {} {}".format(lexicon,
+                                              self.fallback.version())
@@ -0,0 +1,457 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Compiled matcher for the regexes of ``QuestionTemplate`` instances.
+
+A refo pattern is translated once into a flat program for a Thompson-like
+virtual machine. The program is the same one refo builds (so thread
+priorities and group spans are identical) but:
+
+    - It's built once and cached instead of on every match.
+    - ``Pos``, ``Lemma`` and ``Token`` predicates are compared inline instead
+      of through a chain of python calls.
+    - The epsilon closure of the starting state does not depend on the input
+      so it's computed only once.
+
+Matching a sentence of ``n`` words takes ``O(n * m)`` time in the worst
+case, where ``m`` is the size of the program.
+
+When the words are a ``quepy.columnar.ColumnarSentence`` the predicates are
+checked comparing the integer ids of the sentence's columns.
+"""
+
+from refo import Predicate, Disjunction, Concatenation, Star, Plus, \
+    Question, Group, Repetition
+from refo.match import Match as RefoMatch
+
+from quepy.ruleindex import predicate_key, word_keys
+from quepy.columnar import ColumnarSentence, COLUMNS
+
+_EOL = None
+
+# Opcodes
+ATOM = 0
+SPLIT = 1
+SAVE = 2
+ACCEPT = 3
+
+
+def _is_eol(x):
+    return x is _EOL
+
+
+class _Machine(object):
+    """
+    Code and transitions shared by the compiled programs.
+
+    Instructions are tuples stored in `code` and referenced by their index.
+    Their layouts are:
+
+        - ``(ATOM, succ, attr, value)``: consumes a word if
+          ``getattr(word, attr) == value`` or, when `attr` is ``None``,
+          if ``value(word)`` is true.
+        - ``(SPLIT, first, second)``: forks the thread, `first` has
+          higher priority.
+        - ``(SAVE, succ, slot)``: records the current position in `slot`.
+        - ``(ACCEPT, ...)``
+
+    Threads are pairs ``(pc, slots)`` kept in lists in priority order.
+
+    The code used for columnar sentences has the same layout, but the
+    `attr` of ``ATOM`` instructions is the index of a column and `value`
+    the id of the string in the vocabulary.
+    """
+
+    code = ()
+    _column_code = None
+
+    def column_code(self, vocabulary):
+        """
+        Returns the code for columnar sentences using `vocabulary`, adding
+        to it the strings the program looks for.
+        """
+        cached = self._column_code
+        if cached is not None and cached[0] is vocabulary:
+            return cached[1]
+        code = []
+        for instruction in self.code:
+            if instruction[0] == ATOM and instruction[2] is not None:
+                _, succ, attr, value = instruction
+                instruction = (ATOM, succ, COLUMNS.index(attr),
+                               vocabulary.add(value))
+            code.append(instruction)
+        self._column_code = vocabulary, code
+        return code
+
+    def _columns(self, words):
+        """
+        Returns the column code and an iterator over the rows of ids of
+        `words` or ``(None, None)`` if `words` is not a columnar sentence
+        (or its ids are out of date).
+        """
+        if not isinstance(words, ColumnarSentence):
+            return None, None
+        code = self.column_code(words.vocabulary)
+        if not words.is_current(words.vocabulary):
+            return None, None
+        return code, words.rows()
+
+    def _closure(self, threads, i):
+        """
+        Takes epsilon transitions from `threads` until every thread is
+        waiting to consume a word (or accepting).
+        `threads` is a list of ``(pc, slots)`` in priority order and `i` is
+        the position in the sentence.
+        """
+        code = self.code
+        new = []
+        added = set()
+        seen = set()
+        stack = threads[::-1]
+        while stack:
+            pc, slots = stack.pop()
+            instruction = code[pc]
+            op = instruction[0]
+            if op == ATOM or op == ACCEPT:
+                if pc not in added:
+                    added.add(pc)
+                    new.append((pc, slots))
+                continue
+            if pc in seen:
+                continue
+            seen.add(pc)
+            if op == SPLIT:
+                stack.append((instruction[2], slots))
+                stack.append((instruction[1], slots))
+            else:
+                k = instruction[2]
+                slots = slots[:k] + (i,) + slots[k + 1:]
+                stack.append((instruction[1], slots))
+        return new
+
+    def _step(self, threads, word):
+        """
+        Feeds `word` to every thread.
+        """
+        code = self.code
+        new = []
+        added = set()
+        for pc, slots in threads:
+            instruction = code[pc]
+            if instruction[0] == ACCEPT:
+                continue
+            _, succ, attr, value = instruction
+            if attr is None:
+                if not value(word):
+                    continue
+            elif word is _EOL or getattr(word, attr) != value:
+                continue
+            if succ not in added:
+                added.add(succ)
+                new.append((succ, slots))
+        return new
+
+    def _step_row(self, threads, code, row, word):
+        """
+        Feeds `word`, whose tuple of ids is `row`, to every thread using the
+        column `code`.
+        """
+        new = []
+        added = set()
+        for pc, slots in threads:
+            instruction = code[pc]
+            if instruction[0] == ACCEPT:
+                continue
+            _, succ, column, value = instruction
+            if column is None:
+                if not value(word):
+                    continue
+            elif row[column] != value:
+                continue
+            if succ not in added:
+                added.add(succ)
+                new.append((succ, slots))
+        return new
+
+
+class Program(_Machine):
+    """
+    A compiled refo pattern.
+    """
+
+    def __init__(self, pattern):
+        """
+        Compiles `pattern` anchored at the end of the sentence.
+        Raises ``TypeError`` if the pattern contains unknown kind of refo
+        patterns.
+        """
+        self.pattern = pattern
+        self.code = []
+        self.records = []
+        self._slots = {}
+
+        # Same as refo.match(Group(pattern + Literal(_EOL), None), ...)
+        accept = self._emit((ACCEPT,))
+        end = self._emit((SAVE, accept, self._slot((None, 1))))
+        eol = self._emit((ATOM, end, None, _is_eol))
+        code = self._compile(pattern, eol)
+        self.start = self._emit((SAVE, code, self._slot((None, 0))))
+        self.nslots = len(self.records)
+
+        self.initial_threads = self._closure([(self.start,
+                                               (None,) * self.nslots)], 0)
+
+    def _emit(self, instruction):
+        self.code.append(instruction)
+        return len(self.code) - 1
+
+    def _slot(self, record):
+        if record not in self._slots:
+            self._slots[record] = len(self.records)
+            self.records.append(record)
+        return self._slots[record]
+
+    def _compile(self, pattern, cont):
+        if isinstance(pattern, Predicate):
+            key = predicate_key(pattern)
+            if key is None:
+                return self._emit((ATOM, cont, None, pattern.f))
+            attr, value = key
+            return self._emit((ATOM, cont, str(attr), value))
+
+        if isinstance(pattern, Group):
+            return self._compile_group(pattern.x, pattern.key, cont)
+
+        if isinstance(pattern, Disjunction):
+            a = self._compile(pattern.a, cont)
+            b = self._compile(pattern.b, cont)
+            return self._emit((SPLIT, a, b))
+
+        if isinstance(pattern, Concatenation):
+            code = cont
+            for x in reversed(pattern.xs):
+                code = self._compile(x, code)
+            return code
+
+        if isinstance(pattern, (Star, Plus)):
+            split = self._emit(None)
+            x = self._compile(pattern.x, split)
+            if pattern.greedy:
+                self.code[split] = (SPLIT, x, cont)
+            else:
+                self.code[split] = (SPLIT, cont, x)
+            if isinstance(pattern, Star):
+                return split
+            return x
+
+        if isinstance(pattern, Question):
+            x = self._compile(pattern.x, cont)
+            if pattern.greedy:
+                return self._emit((SPLIT, x, cont))
+            return self._emit((SPLIT, cont, x))
+
+        if isinstance(pattern, Repetition):
+            code = cont
+            if pattern.mx is not None:
+                question = Question(pattern.x, pattern.greedy)
+                for _ in xrange(pattern.mx - pattern.mn):
+                    code = self._compile(question, code)
+            else:
+                star = Star(pattern.x, greedy=pattern.greedy)
+                code = self._compile(star, code)
+            for _ in xrange(pattern.mn):
+                code = self._compile(pattern.x, code)
+            return code
+
+        message = u"Can't compile pattern of type {}"
+        raise TypeError(message.format(type(pattern).__name__))
+
+    def _compile_group(self, pattern, key, cont):
+        end = self._emit((SAVE, cont, self._slot((key, 1))))
+        code = self._compile(pattern, end)
+        return self._emit((SAVE, code, self._slot((key, 0))))
+
+    def _cutoff(self, threads):
+        """
+        Returns the slots of the accepting thread with highest priority (or
+        ``None``) and the threads with higher priority than it.
+        """
+        code = self.code
+        for n, (pc, slots) in enumerate(threads):
+            if code[pc][0] == ACCEPT:
+                return slots, threads[:n]
+        return None, threads
+
+    def match(self, words):
+        """
+        Matches `words` against the whole program.
+        Returns a ``refo.match.Match`` instance or ``None``.
+        """
+        slots, threads = self._cutoff(self.initial_threads)
+        code, rows = self._columns(words)
+        i = 0
+        for word in words:
+            if not threads:
+                break
+            i += 1
+            if rows is None:
+                threads = self._step(threads, word)
+            else:
+                threads = self._step_row(threads, code, next(rows), word)
+            threads = self._closure(threads, i)
+            accepted, threads = self._cutoff(threads)
+            if accepted is not None:
+                slots = accepted
+        else:
+            if threads:
+                threads = self._closure(self._step(threads, _EOL), i + 1)
+                accepted, threads = self._cutoff(threads)
+                if accepted is not None:
+                    slots = accepted
+
+        if slots is None:
+            return None
+        return _make_match(self.records, slots)
+
+
+class UnionProgram(_Machine):
+    """
+    Many compiled programs joined into a single one that matches all of them
+    in a single pass over the words.
+
+    Each program keeps its own thread priorities, so the result for each of
+    them is the same as running it on its own. The threads waiting for the
+    first word are indexed by the word key they check, so a question only
+    wakes up the programs that can start with its first word.
+    """
+
+    def __init__(self, programs):
+        """
+        `programs` is a list of ``Program`` instances. Any other object with
+        a ``match`` method (like refo fallbacks) is matched on its own.
+        """
+        self.programs = list(programs)
+        self.code = []
+        self.owner = []
+        self.initial_threads = []
+        self._fallbacks = []
+
+        for n, program in enumerate(self.programs):
+            if not isinstance(program, Program):
+                self._fallbacks.append((n, program))
+                continue
+            offset = len(self.code)
+            for instruction in program.code:
+                self.code.append(_relocate(instruction, offset, n))
+                self.owner.append(n)
+            for pc, slots in program.initial_threads:
+                self.initial_threads.append((pc + offset, slots))
+
+        self._by_first = {}
+        self._any_first = []
+        for n, (pc, _) in enumerate(self.initial_threads):
+            instruction = self.code[pc]
+            if instruction[0] == ATOM and instruction[2] is not None:
+                key = instruction[2], instruction[3]
+                self._by_first.setdefault(key, []).append(n)
+            else:
+                self._any_first.append(n)
+
+    def _first_threads(self, word):
+        """
+        Returns the initial threads that could consume `word`.
+        """
+        positions = list(self._any_first)
+        for key in word_keys(word):
+            positions.extend(self._by_first.get(key, ()))
+        positions.sort()
+        initial = self.initial_threads
+        return [initial[n] for n in positions]
+
+    def _cutoff(self, threads, results):
+        """
+        Stores in `results` the slots of the accepting thread with highest
+        priority of each program and removes the threads of that program with
+        lower priority.
+        """
+        code = self.code
+        owner = self.owner
+        done = set()
+        alive = []
+        for pc, slots in threads:
+            n = owner[pc]
+            if n in done:
+                continue
+            if code[pc][0] == ACCEPT:
+                results[n] = slots
+                done.add(n)
+                continue
+            alive.append((pc, slots))
+        return alive
+
+    def match(self, words):
+        """
+        Matches `words` against every program.
+        Returns a list of pairs ``(n, match)`` where `n` is the index of the
+        matching program in `programs` and `match` is a ``refo.match.Match``
+        instance. The list is sorted by `n`.
+        """
+        results = {}
+        threads = self.initial_threads
+        if words:
+            threads = self._first_threads(words[0])
+        code, rows = self._columns(words)
+        i = 0
+        for word in words:
+            if not threads:
+                break
+            i += 1
+            if rows is None:
+                threads = self._step(threads, word)
+            else:
+                threads = self._step_row(threads, code, next(rows), word)
+            threads = self._closure(threads, i)
+            threads = self._cutoff(threads, results)
+        else:
+            if threads:
+                threads = self._closure(self._step(threads, _EOL), i + 1)
+                self._cutoff(threads, results)
+
+        matches = []
+        for n, slots in results.iteritems():
+            matches.append((n, _make_match(self.programs[n].records, slots)))
+        for n, program in self._fallbacks:
+            match = program.match(words)
+            if match is not None:
+                matches.append((n, match))
+        matches.sort(key=lambda x: x[0])
+        return matches
+
+
+def _relocate(instruction, offset, owner):
+    op = instruction[0]
+    if op == ATOM:
+        _, succ, attr, value = instruction
+        return ATOM, succ + offset, attr, value
+    elif op == SPLIT:
+        _, first, second = instruction
+        return SPLIT, first + offset, second + offset
+    elif op == SAVE:
+        _, succ, slot = instruction
+        return SAVE, succ + offset, slot
+    return ACCEPT, owner
+
+
+def _make_match(records, slots):
+    state = {}
+    for record, value in zip(records, slots):
+        if value is not None:
+            state[record] = value
+    return RefoMatch(state)
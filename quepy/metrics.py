@@ -0,0 +1,156 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Metrics about the translation of questions.
+
+Quepy reports the duration of its stages and some counters to the
+registered collectors, objects with the interface of `Collector`. To export
+the metrics to a monitoring system subclass `Collector` and register an
+instance with `register_collector` or name it in the `METRICS_COLLECTORS`
+setting.
+
+The reported metrics are:
+
+    - timings: ``tagging``, ``tagging_batch`` (a whole ``tag_many`` call),
+      ``matching``, ``template_match`` (with the ``template`` label),
+      ``interpretation`` (with the ``template`` label) and ``generation``
+      (with the ``language`` label).
+    - counters: ``rules_tried``, ``rules_matched``, ``tagger_cache_hits``,
+      ``tagger_cache_misses``, ``query_cache_hits`` and
+      ``query_cache_misses``.
+
+When there are no collectors reporting costs almost nothing.
+"""
+
+import threading
+from importlib import import_module
+
+_collectors = []
+_loaded = {}  # Collectors loaded from "module:attribute" strings
+
+
+class Collector(object):
+    """
+    Base class for the objects that receive the metrics.
+    `labels` is a dict from unicode to unicode or ``None``.
+    """
+
+    def timing(self, name, seconds, labels=None):
+        """
+        Receives the duration in seconds of the stage `name`.
+        """
+
+    def increment(self, name, value=1, labels=None):
+        """
+        Receives an increment of the counter `name`.
+        """
+
+
+class MemoryCollector(Collector):
+    """
+    Collector that keeps the totals in memory, keyed by the pair
+    ``(name, labels)`` where `labels` is a sorted tuple of items.
+    """
+
+    def __init__(self):
+        self.timings = {}  # Key to the pair (count, total seconds)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def timing(self, name, seconds, labels=None):
+        key = _key(name, labels)
+        with self._lock:
+            count, total = self.timings.get(key, (0, 0.0))
+            self.timings[key] = count + 1, total + seconds
+
+    def increment(self, name, value=1, labels=None):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self.timings.clear()
+            self.counters.clear()
+
+
+def _key(name, labels):
+    if not labels:
+        return name, ()
+    return name, tuple(sorted(labels.iteritems()))
+
+
+def register_collector(collector):
+    """
+    Starts reporting the metrics to `collector`, a `Collector` instance or
+    subclass or a ``"module:attribute"`` string pointing to any of those.
+    Registering the same collector twice has no effect, neither does
+    registering a class that already has a registered instance.
+    Returns the registered instance.
+    """
+    if isinstance(collector, basestring):
+        spec = collector
+        collector = _loaded.get(spec)
+        if collector is None:
+            if u":" not in spec:
+                raise ValueError(u"Invalid collector {!r}".format(spec))
+            module_name, attr = spec.split(u":", 1)
+            collector = getattr(import_module(module_name), attr)
+            if isinstance(collector, type):
+                collector = _instance_of(collector)
+            _loaded[spec] = collector
+    elif isinstance(collector, type):
+        collector = _instance_of(collector)
+
+    if not isinstance(collector, Collector):
+        raise ValueError(u"Invalid collector {!r}".format(collector))
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+
+def _instance_of(cls):
+    for collector in _collectors:
+        if type(collector) is cls:
+            return collector
+    return cls()
+
+
+def unregister_collector(collector):
+    """
+    Stops reporting the metrics to `collector`.
+    """
+    if isinstance(collector, basestring):
+        collector = _loaded.pop(collector, None)
+    if collector in _collectors:
+        _collectors.remove(collector)
+
+
+def collecting():
+    """
+    Returns ``True`` if there is any collector registered.
+    """
+    return bool(_collectors)
+
+
+def timing(name, seconds, labels=None):
+    """
+    Reports the duration in seconds of the stage `name`.
+    """
+    for collector in _collectors:
+        collector.timing(name, seconds, labels)
+
+
+def increment(name, value=1, labels=None):
+    """
+    Reports an increment of the counter `name`.
+    """
+    for collector in _collectors:
+        collector.increment(name, value, labels)
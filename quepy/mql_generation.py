@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
-import re
-import json
+from json.encoder import encode_basestring_ascii as _encode
+
+from quepy import settings
 from quepy.dsl import IsRelatedTo
 from quepy.expression import isnode
+from quepy.traversal import get_traversal, breadth_first
 from quepy.encodingpolicy import encoding_flexible_conversion
 
 
@@ -15,9 +17,9 @@ def choose_start_node(e):
     # Since data "nodes" have no outgoing edges it sufices to find any node
     # with an outgoing edge.
     for node in e.iter_nodes():
-        if list(e.iter_edges(node)):
+        for _ in e.iter_edges(node):
             return node
-    return node
+    return len(e) - 1
 
 
 def safely_to_unicode(x):
@@ -40,19 +42,27 @@ def to_bidirected_graph(e):
     edge.
     If an edge goes into a data, it should not be reversed.
     """
-    graph = {node: [] for node in e.iter_nodes()}
-    for node in e.iter_nodes():
-        for relation, other in e.iter_edges(node):
-            relation = safely_to_unicode(relation)
-            if isnode(other):
-                graph[other].append((u"!" + relation, node))
-            else:
-                other = safely_to_unicode(other)
-            graph[node].append((relation, other))
-    assert all(isnode(x) for x in graph) and len(e) == len(graph)
+    graph = {}
+    for node, edges in enumerate(get_traversal(e).neighbours):
+        graph[node] = [(_label(relation, reversed_), _value(other))
+                       for relation, other, reversed_ in edges]
+    assert len(e) == len(graph)
     return graph
 
 
+def _label(relation, reversed_):
+    relation = safely_to_unicode(relation)
+    if reversed_:
+        return u"!" + relation
+    return relation
+
+
+def _value(x):
+    if isnode(x):
+        return x
+    return safely_to_unicode(x)
+
+
 def post_order_depth_first(graph, start):
     """
     Iterate over the nodes of the graph (is a tree) in a way such that every
@@ -61,19 +71,9 @@ def post_order_depth_first(graph, start):
     beacuse Expressions are trees.
     `start` is the node to use as the root of the tree.
     """
-    q = [start]
-    seen = set()
-    i = 0
-    while i != len(graph):
-        node = q[i]
-        seen.add(node)
-        i += 1
-        for _, other in graph[node]:
-            if isnode(other) and other not in seen:
-                q.append(other)
-    assert len(q) == len(graph)
-    q.reverse()
-    return q
+    order, _ = breadth_first(graph, start)
+    order.reverse()
+    return order
 
 
 def paths_from_root(graph, start):
@@ -83,59 +83,87 @@ def paths_from_root(graph, start):
     ie.: `paths_from_node(graph, start)[node]` is a list of the edge names used
     to get to `node` form `start`.
     """
+    order, parents = breadth_first(graph, start)
     paths = {start: []}
-    q = [start]
-    seen = set()
-    while q:
-        node = q.pop()
-        seen.add(node)
-        for relation, child in graph[node]:
-            if isnode(child) and child not in seen:
-                q.append(child)
-                paths[child] = paths[node] + [relation]
+    for node in order[1:]:
+        parent, relation = parents[node]
+        paths[node] = paths[parent] + [relation]
     return paths
 
 
-def generate_mql(e):
+def generate_mql(e, compact=None):
     """
     Generates a MQL query for the `Expression` `e`.
+    The query is indented unless `compact` is ``True`` (defaults to the
+    ``MQL_COMPACT`` setting).
     """
-    start = choose_start_node(e)
-    graph = to_bidirected_graph(e)
-    generated = {}
-    for node in post_order_depth_first(graph, start):
-        d = {}
-        for relation, other in graph[node]:
-            if isnode(other):
-                try:
-                    other = generated[other]
-                except KeyError:
-                    continue  # other is not in post_order_depth_first order
-            d[relation] = other
-        generated[node] = [d]
-
-    mql_query = json.dumps(generated[start], sort_keys=True,
-                            indent=2, separators=(',', ': '))
-    mql_query = _tidy(mql_query)
-    target = paths_from_root(graph, start)[e.get_head()]
+    if compact is None:
+        compact = getattr(settings, "MQL_COMPACT", False)
+    traversal = get_traversal(e)
+    tree = traversal.tree(choose_start_node(e))
+    out = []
+    _write(traversal, tree, compact, out)
+    mql_query = "".join(out)
+    target = [_label(relation, reversed_)
+              for relation, reversed_ in tree.path(e.get_head())]
     return target, mql_query
 
 
-def _tidy(mql):
-    """
-    Given a json representing a MQL query it collapses spaces between
-    braces and curly braces to make it look tidy.
-    """
-    def replacement_function(match):
-        text = match.group(0)
-        if text.startswith("[") and text.endswith("]"):
-            return "[{}]"
-        elif text.startswith("["):
-            return "[{"
-        indent = 0
-        match = re.search("}[ \t]*\n(\s*?)\]", text)
-        if match:
-            indent = len(match.group(1))
-        return " " * indent + "}]"
-    return re.sub("\[\s*{\s*}\s*\]|\[\s+{|[ \t]*}\s+\]",
-                  replacement_function, mql)
+def _children(traversal, tree, node):
+    """
+    Returns the pairs ``(relation, child or data)`` of `node` sorted by
+    relation, the last one is kept if a relation repeats.
+    """
+    parent = tree.parents[node]
+    if parent is not None:
+        parent = parent[0]
+    d = {}
+    for relation, other, reversed_ in traversal.neighbours[node]:
+        if other == parent and isnode(other):
+            continue
+        d[_label(relation, reversed_)] = _value(other)
+    return sorted(d.iteritems())
+
+
+def _write(traversal, tree, compact, out):
+    """
+    Writes the query into the list `out`.
+    Unless `compact` is ``True`` it's indented as ``json.dumps`` with an
+    indentation of 2 would, but with the opening and closing brackets and
+    braces of each ``[{...}]`` together.
+    """
+    colon = ":" if compact else ": "
+    stack = []  # Pairs (level, iterator over the remaining children)
+    node = tree.root
+    level = 0
+    while True:
+        children = _children(traversal, tree, node)
+        if children:
+            out.append("[{")
+            stack.append((level, enumerate(children)))
+        else:
+            out.append("[{}]")
+
+        while stack:
+            level, children = stack[-1]
+            try:
+                n, (relation, other) = next(children)
+            except StopIteration:
+                stack.pop()
+                if not compact:
+                    out.append("\n" + " " * (2 * level))
+                out.append("}]")
+                continue
+            if n:
+                out.append(",")
+            if not compact:
+                out.append("\n" + " " * (2 * level + 4))
+            out.append(_encode(relation))
+            out.append(colon)
+            if isnode(other):
+                node = other
+                level += 2
+                break
+            out.append(_encode(other))
+        else:
+            return
@@ -15,67 +15,182 @@ Tagging using NLTK.
 #   - "averaged_perceptron_tagger" in Models
 #   - "wordnet" in Corpora
 
+import io
+import json
 import nltk
-from quepy.tagger import Word
+from quepy import settings
+from quepy.tagger import Word, TaggerBackend
 from quepy.encodingpolicy import assert_valid_encoding
 
-_penn_to_morphy_tag = {}
+_penn_to_morphy_tag = {}  # Keyed by the first two letters of the penn tag
+_resources = None  # (nltk_data_path, pos_tagger, wordnet) once loaded
+
+# Memo of wordnet's lemmatisation: (token, morphy tag) -> lemma
+_lemmas = {}
+_lemma_table = None  # Path of the last lemma table loaded
 
 
 def penn_to_morphy_tag(tag):
     assert_valid_encoding(tag)
+    return _penn_to_morphy_tag.get(tag[:2])
 
-    for penn, morphy in _penn_to_morphy_tag.iteritems():
-        if tag.startswith(penn):
-            return morphy
-    return None
 
+def lemmatize(token, mtag, wordnet):
+    """
+    Returns the lemma of `token` for the morphy tag `mtag` (can be ``None``).
+    Results of wordnet are remembered, up to ``settings.NLTK_LEMMA_MEMO_SIZE``
+    of them.
+    """
+    key = token, mtag
+    lemma = _lemmas.get(key)
+    if lemma is not None:
+        return lemma
+
+    # Nice shooting, son. What's your name?
+    lemma = wordnet.morphy(token, pos=mtag)
+    if isinstance(lemma, str):
+        # In this case lemma is example-based, because if it's rule based
+        # the result should be unicode (input was unicode).
+        # Since english is ascii the decoding is ok.
+        lemma = lemma.decode("ascii")
+    if lemma is None:
+        lemma = token.lower()
+
+    if len(_lemmas) < settings.NLTK_LEMMA_MEMO_SIZE:
+        _lemmas[key] = lemma
+    return lemma
+
+
+def save_lemma_table(path):
+    """
+    Saves the lemmas remembered so far on the file `path`.
+    """
+    table = [[token, mtag, lemma]
+             for (token, mtag), lemma in sorted(_lemmas.iteritems())]
+    with io.open(path, "w", encoding="utf-8") as filehandler:
+        # json gives str instead of unicode when there's nothing to escape
+        filehandler.write(unicode(json.dumps(table, ensure_ascii=False)))
 
-def run_nltktagger(string, nltk_data_path=None):
+
+def load_lemma_table(path):
     """
-    Runs nltk tagger on `string` and returns a list of
-    :class:`quepy.tagger.Word` objects.
+    Adds the lemmas saved by `save_lemma_table` on the file `path` to the
+    remembered ones.
     """
-    assert_valid_encoding(string)
-    global _penn_to_morphy_tag
+    global _lemma_table
+
+    with io.open(path, encoding="utf-8") as filehandler:
+        table = json.load(filehandler)
+    for token, mtag, lemma in table:
+        # json gives unicode, but morphy tags are str
+        if mtag is not None:
+            mtag = str(mtag)
+        _lemmas[token, mtag] = lemma
+    _lemma_table = path
+
+
+def load_resources(nltk_data_path=None):
+    """
+    Loads the POS tagger model and the WordNet corpus and returns the pair
+    ``(pos_tagger, wordnet)``.
+    They are loaded only once, following calls return the same objects
+    unless `nltk_data_path` changes (``None`` and an empty list are the
+    same path).
+    """
+    global _penn_to_morphy_tag, _resources
+
+    if nltk_data_path:
+        nltk_data_path = list(nltk_data_path)
+    else:
+        nltk_data_path = None
+    if _resources is not None and _resources[0] == nltk_data_path:
+        return _resources[1:]
 
     if nltk_data_path:
         nltk.data.path = nltk_data_path
 
     from nltk.corpus import wordnet
+    from nltk.tag.perceptron import PerceptronTagger
+
+    pos_tagger = PerceptronTagger()
+    # WordNet is loaded lazily, force it now.
+    wordnet.morphy(u"goals", wordnet.NOUN)
+
+    _penn_to_morphy_tag = {
+        u'NN': wordnet.NOUN,
+        u'JJ': wordnet.ADJ,
+        u'VB': wordnet.VERB,
+        u'RB': wordnet.ADV,
+    }
+    if settings.NLTK_LEMMA_TABLE and \
+       settings.NLTK_LEMMA_TABLE != _lemma_table:
+        load_lemma_table(settings.NLTK_LEMMA_TABLE)
+    _resources = nltk_data_path, pos_tagger, wordnet
+    return pos_tagger, wordnet
 
-    if not _penn_to_morphy_tag:
-        _penn_to_morphy_tag = {
-            u'NN': wordnet.NOUN,
-            u'JJ': wordnet.ADJ,
-            u'VB': wordnet.VERB,
-            u'RB': wordnet.ADV,
-        }
+
+def run_nltktagger(string, nltk_data_path=None):
+    """
+    Runs nltk tagger on `string` and returns a list of
+    :class:`quepy.tagger.Word` objects.
+    """
+    assert_valid_encoding(string)
+    pos_tagger, wordnet = load_resources(nltk_data_path)
 
     # Recommended tokenizer doesn't handle non-ascii characters very well
     #tokens = nltk.word_tokenize(string)
     tokens = nltk.wordpunct_tokenize(string)
-    tags = nltk.pos_tag(tokens)
+    tags = pos_tagger.tag(tokens)
+    return _make_words(tags, wordnet)
+
+
+def run_nltktagger_many(strings, nltk_data_path=None):
+    """
+    Runs nltk tagger on every string of the list `strings` at once and
+    returns a list with a list of :class:`quepy.tagger.Word` objects for each
+    one of them.
+    """
+    for string in strings:
+        assert_valid_encoding(string)
+    pos_tagger, wordnet = load_resources(nltk_data_path)
+
+    sentences = [nltk.wordpunct_tokenize(string) for string in strings]
+    tagged = pos_tagger.tag_sents(sentences)
+    return [_make_words(tags, wordnet) for tags in tagged]
+
 
+def _make_words(tags, wordnet):
+    """
+    Builds the :class:`quepy.tagger.Word` objects for the list of
+    ``(token, pos)`` pairs `tags`.
+    """
     words = []
     for token, pos in tags:
-        word = Word(token)
         # Eliminates stuff like JJ|CC
         # decode ascii because they are the penn-like POS tags (are ascii).
-        word.pos = pos.split("|")[0].decode("ascii")
-
-        mtag = penn_to_morphy_tag(word.pos)
-        # Nice shooting, son. What's your name?
-        lemma = wordnet.morphy(word.token, pos=mtag)
-        if isinstance(lemma, str):
-            # In this case lemma is example-based, because if it's rule based
-            # the result should be unicode (input was unicode).
-            # Since english is ascii the decoding is ok.
-            lemma = lemma.decode("ascii")
-        word.lemma = lemma
-        if word.lemma is None:
-            word.lemma = word.token.lower()
-
-        words.append(word)
+        pos = pos.split("|")[0].decode("ascii")
+        mtag = _penn_to_morphy_tag.get(pos[:2])
+        lemma = lemmatize(token, mtag, wordnet)
+        # The input was checked to be unicode, so are tokens and lemmas.
+        words.append(Word.trusted(token, lemma, pos))
 
     return words
+
+
+class NLTKBackend(TaggerBackend):
+    """
+    Tagger backend that runs the NLTK tagger.
+    """
+
+    def tag(self, string):
+        return run_nltktagger(string, settings.NLTK_DATA_PATH)
+
+    def tag_many(self, strings):
+        return run_nltktagger_many(strings, settings.NLTK_DATA_PATH)
+
+    def warmup(self):
+        load_resources(settings.NLTK_DATA_PATH)
+
+    def version(self):
+        table = getattr(settings, "NLTK_LEMMA_TABLE", None)
+        return u"nltk {} {}".format(nltk.__version__, table)
@@ -0,0 +1,112 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Translation of large amounts of questions using many processes.
+
+Tagging and matching are CPU bound python code, so questions are split in
+chunks and sent to a pool of worker processes, each one with its own
+installed copy of the app.
+"""
+
+import itertools
+import multiprocessing
+
+from quepy.quepyapp import install, question_sanitize
+
+_app = None
+
+
+def _initialize(app_name):
+    """
+    Installs the app once per worker process.
+    """
+    global _app
+    _app = install(app_name)
+
+
+def _translate_chunk(questions):
+    """
+    Translates a list of questions using the worker's app.
+    """
+    return translate_questions(_app, questions)
+
+
+def translate_questions(app, questions):
+    """
+    Returns a list with a record ``(question, target, query, userdata)`` for
+    each question of the list `questions` using the installed `app`.
+    The query is the same one that `QuepyApp.get_query` gives, so `target`,
+    `query` and `userdata` are ``None`` if no rule matches.
+    """
+    sanitized = [question_sanitize(question) for question in questions]
+    records = []
+    for question, queries in zip(questions,
+                                 app.get_queries_many(sanitized)):
+        if queries:
+            target, query, userdata = queries[0]
+        else:
+            target, query, userdata = None, None, None
+        records.append((question, target, query, userdata))
+    return records
+
+
+def make_pool(app_name, jobs=None):
+    """
+    Returns a `multiprocessing.Pool` of `jobs` processes (defaults to the
+    number of CPUs), each one with its own installed copy of the app
+    `app_name`.
+    """
+    return multiprocessing.Pool(jobs, _initialize, (app_name,))
+
+
+def chunks(iterable, size):
+    """
+    Yields the items of `iterable` in lists of `size` items (the last one
+    may be shorter).
+    """
+    iterable = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def translate(app_name, questions, jobs=None, chunksize=100):
+    """
+    Translates the questions of the iterable `questions` using `jobs`
+    processes (defaults to the number of CPUs) running the app `app_name`.
+    Yields the records of `translate_questions` in the same order as the
+    questions.
+    """
+    pieces = chunks(questions, chunksize)
+
+    if jobs == 1:
+        app = install(app_name)
+        for chunk in pieces:
+            for record in translate_questions(app, chunk):
+                yield record
+        return
+
+    pool = make_pool(app_name, jobs)
+    finished = False
+    try:
+        for records in pool.imap(_translate_chunk, pieces):
+            for record in records:
+                yield record
+        finished = True
+    finally:
+        # If the caller stopped early (or something failed) don't wait for
+        # the remaining chunks.
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
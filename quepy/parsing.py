@@ -8,9 +8,13 @@
 #          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
 
 import refo
+import time
 import logging
+from copy import copy, deepcopy
 from refo import Predicate, Literal, Star, Any, Group
 
+from quepy import metrics
+from quepy.expression import Expression
 from quepy.encodingpolicy import encoding_flexible_conversion
 
 _EOL = None
@@ -42,12 +46,33 @@ class WordList(list):
         return " ".join([x.lemma for x in self])
 
 
+def _copy_value(value):
+    """
+    Copies an interpretation: expressions are copied on write and lists,
+    tuples and dicts are rebuilt with copies of their items.
+    """
+    if isinstance(value, Expression):
+        return copy(value)
+    kind = type(value)
+    if kind is list or kind is tuple:
+        return kind(_copy_value(x) for x in value)
+    if kind is dict:
+        return {key: _copy_value(x) for key, x in value.iteritems()}
+    return deepcopy(value)
+
+
 class Match(object):
     """
     Holds the matching of the regex.
+
+    Interpretations of particles are remembered in `interpretations` by
+    particle (see `Particle.memo_key`) and span of words, so passing the same
+    dict to the matches of many rules over the same words interprets each
+    particle only once. Interpreted values are copied before being returned
+    so they can be modified freely.
     """
 
-    def __init__(self, match, words, i=None, j=None):
+    def __init__(self, match, words, i=None, j=None, interpretations=None):
         assert isinstance(i, type(j))  # Aprox: Both None or both int
         self._match = match
         self._words = words
@@ -55,6 +80,9 @@ class Match(object):
         self._j = j
         self._particles = {particle.name: particle for particle in match
                            if isinstance(particle, Particle)}
+        if interpretations is None:
+            interpretations = {}
+        self._interpretations = interpretations
 
     @property
     def words(self):
@@ -64,12 +92,24 @@ class Match(object):
         return WordList(self._words[i:j])
 
     def __getattr__(self, attr):
+        if attr.startswith("__"):
+            # Special methods looked up by copy, pickle, etc.
+            message = "'{}' object has no attribute '{}'"
+            raise AttributeError(message.format(self.__class__.__name__, attr))
+
         if attr in self._particles:
             particle = self._particles[attr]
             i, j = self._match[particle]
             self._check_valid_indexes(i, j, attr)
-            match = Match(self._match, self._words, i, j)
-            return particle.interpret(match)
+            key = particle.memo_key(), i, j
+            try:
+                value = self._interpretations[key]
+            except KeyError:
+                match = Match(self._match, self._words, i, j,
+                              self._interpretations)
+                value = particle.interpret(match)
+                self._interpretations[key] = value
+            return _copy_value(value)
 
         try:
             i, j = self._match[attr]
@@ -94,6 +134,7 @@ class QuestionTemplate(object):
 
     regex = Star(Any())  # Must define when subclassing
     weight = 1  # Redefine this to give different priorities to your regexes.
+    _program = None
 
     def interpret(self, match):
         """
@@ -109,14 +150,33 @@ class QuestionTemplate(object):
         rulename = self.__class__.__name__
         logger.debug("Trying to match with regex: {}".format(rulename))
 
-        match = refo.match(self.regex + Literal(_EOL), words + [_EOL])
+        match = self.match(words)
 
         if not match:
             logger.debug("No match")
             return None, None
 
+        return self.get_match_interpretation(match, words)
+
+    def get_match_interpretation(self, match, words, interpretations=None):
+        """
+        Returns the interpretation of a refo `match` of this template's regex
+        over `words`, as returned by `get_interpretation`.
+        `interpretations` is a dict to share the interpretations of particles
+        with the other rules matched over the same `words` (see `Match`).
+        """
+        if not metrics.collecting():
+            return self._interpret_match(match, words, interpretations)
+        start = time.time()
         try:
-            match = Match(match, words)
+            return self._interpret_match(match, words, interpretations)
+        finally:
+            metrics.timing(u"interpretation", time.time() - start,
+                           {u"template": self.__class__.__name__})
+
+    def _interpret_match(self, match, words, interpretations):
+        try:
+            match = Match(match, words, interpretations=interpretations)
             result = self.interpret(match)
         except BadSemantic as error:
             logger.debug(str(error))
@@ -126,9 +186,51 @@ class QuestionTemplate(object):
         except TypeError:
             expression, userdata = result, None
 
-        expression.rule_used = rulename
+        expression.rule_used = self.__class__.__name__
         return expression, userdata
 
+    def get_program(self):
+        """
+        Returns the compiled program for `regex`.
+        The regex is compiled the first time and the program is cached (and
+        rebuilt if `regex` is replaced).
+        """
+        program = self._program
+        if program is None or program.pattern is not self.regex:
+            from quepy.matcher import Program
+            try:
+                program = Program(self.regex)
+            except TypeError as error:
+                logger.debug(str(error))
+                program = _RefoProgram(self.regex)
+            self._program = program
+        return program
+
+    def match(self, words):
+        """
+        Matches `words` against `regex` and returns a refo match or ``None``.
+        """
+        if not metrics.collecting():
+            return self.get_program().match(words)
+        start = time.time()
+        match = self.get_program().match(words)
+        metrics.timing(u"template_match", time.time() - start,
+                       {u"template": self.__class__.__name__})
+        return match
+
+
+class _RefoProgram(object):
+    """
+    Fallback for regexes that can't be compiled: uses refo directly.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._anchored = pattern + Literal(_EOL)
+
+    def match(self, words):
+        return refo.match(self._anchored, words + [_EOL])
+
 
 class Pos(Predicate):
     """
@@ -178,6 +280,14 @@ class Particle(Group):
         self.name = name
         super(Particle, self).__init__(self.regex, self)
 
+    def memo_key(self):
+        """
+        Returns the key that tells apart the interpretations of this particle
+        from others over the same words (see `Match`). Redefine it if the
+        interpretation depends on more than the class and the name.
+        """
+        return self.__class__, self.name
+
     def interpret(self, match):
         message = "A interpretation must be defined for {}"
         raise NotImplementedError(message.format(self.__class__.__name__))
@@ -11,22 +11,32 @@
 Implements the Quepy Application API
 """
 
+import time
 import logging
+from copy import deepcopy
 from importlib import import_module
 from types import ModuleType
 
 from quepy import settings
+from quepy import metrics
 from quepy import generation
 from quepy.parsing import QuestionTemplate
-from quepy.tagger import get_tagger, TaggingError
+from quepy.matcher import Program, UnionProgram
+from quepy.columnar import Vocabulary, ColumnarSentence
+from quepy.ruleindex import RuleIndex
+from quepy.cache import LRUCache
+from quepy.tagger import get_tagger, normalize, TaggingError
 from quepy.encodingpolicy import encoding_flexible_conversion
 
 logger = logging.getLogger("quepy.quepyapp")
+_missing = object()
 
 
-def install(app_name):
+def install(app_name, preload=False):
     """
     Installs the application and gives an QuepyApp object
+    If `preload` is ``True`` everything needed to answer questions is loaded
+    right away (see `QuepyApp.warmup`).
     """
 
     module_paths = {
@@ -42,7 +52,7 @@ def install(app_name):
             message = u"Error importing {0!r}: {1}"
             raise ImportError(message.format(module_name, error))
 
-    return QuepyApp(**modules)
+    return QuepyApp(preload=preload, **modules)
 
 
 def question_sanitize(question):
@@ -51,14 +61,32 @@ def question_sanitize(question):
     return question
 
 
+def _settings_values():
+    """
+    Returns a dict with the current values of the quepy settings.
+    """
+    return dict((key, value) for key, value in vars(settings).iteritems()
+                if key.upper() == key)
+
+
+def _copy_queries(queries):
+    """
+    Returns a list with the triples of `queries`, with a copy of the
+    userdata so callers can't modify the cached one.
+    """
+    return [(target, query, deepcopy(userdata))
+            for target, query, userdata in queries]
+
+
 class QuepyApp(object):
     """
     Provides the quepy application API.
     """
 
-    def __init__(self, parsing, settings):
+    def __init__(self, parsing, settings, preload=False):
         """
         Creates the application based on `parsing`, `settings` modules.
+        If `preload` is ``True`` it calls `warmup`.
         """
 
         assert isinstance(parsing, ModuleType)
@@ -74,6 +102,10 @@ class QuepyApp(object):
         self.language = getattr(self._settings_module, "LANGUAGE", None)
         if not self.language:
             raise ValueError("Missing configuration for language")
+        self.union_matcher = getattr(self._settings_module,
+                                     "UNION_MATCHER", False)
+        self.columnar_matcher = getattr(self._settings_module,
+                                        "COLUMNAR_MATCHER", False)
 
         self.rules = []
         for element in dir(self._parsing_module):
@@ -88,6 +120,44 @@ class QuepyApp(object):
                 continue
 
         self.rules.sort(key=lambda x: x.weight, reverse=True)
+        self._rule_index = RuleIndex(self.rules)
+        self._union_program = None
+        self._union_rules = None
+        self._vocabulary = None
+        self._vocabulary_rules = None
+
+        self._query_cache = None
+        self._query_cache_fingerprint = None
+        size = getattr(self._settings_module, "QUERY_CACHE_SIZE", 0)
+        if size:
+            self._query_cache = LRUCache(size)
+
+        for collector in getattr(self._settings_module,
+                                 "METRICS_COLLECTORS", []):
+            metrics.register_collector(collector)
+
+        if preload:
+            self.warmup()
+
+    def warmup(self):
+        """
+        Loads the tagger resources and compiles the rules so the first
+        question served doesn't pay for it.
+        Returns the amount of seconds it took.
+        """
+
+        start = time.time()
+        self.tagger.warmup()
+        if self.union_matcher:
+            self._get_union_program()
+        else:
+            for rule in self.rules:
+                rule.get_program()
+        if self.columnar_matcher:
+            self._get_vocabulary()
+        elapsed = time.time() - start
+        logger.info(u"App warmed up in {0:.2f} seconds".format(elapsed))
+        return elapsed
 
     def get_query(self, question):
         """
@@ -118,36 +188,271 @@ class QuepyApp(object):
 
         The queries returned corresponds to the regexes that match in
         weight order.
+
+        If the `QUERY_CACHE_SIZE` setting is not 0 the results are
+        remembered for every question, so repeated questions skip the whole
+        pipeline.
         """
         question = encoding_flexible_conversion(question)
+        cache = self._get_query_cache()
+        if cache is None:
+            return self._iter_queries(question)
+
+        key = normalize(question), self.language
+        queries = cache.get(key)
+        if queries is None:
+            metrics.increment(u"query_cache_misses")
+            queries = tuple(self._iter_queries(question))
+            cache.set(key, queries)
+        else:
+            metrics.increment(u"query_cache_hits")
+        return iter(_copy_queries(queries))
+
+    def get_queries_many(self, questions):
+        """
+        Given a list of `questions` in natural language, it returns a list
+        with the list of triples that `get_queries` gives for each one of
+        them, in the same order.
+
+        Repeated questions are processed only once and all the questions are
+        tagged in a single batch.
+        """
+        questions = [encoding_flexible_conversion(x) for x in questions]
+        keys = [normalize(question) for question in questions]
+        cache = self._get_query_cache()
+
+        results = {}
+        missing = []
+        for key in keys:
+            if key in results:
+                continue
+            queries = None
+            if cache is not None:
+                queries = cache.get((key, self.language))
+            if queries is None:
+                missing.append(key)
+            results[key] = queries
+
+        if cache is not None:
+            metrics.increment(u"query_cache_misses", len(missing))
+            metrics.increment(u"query_cache_hits",
+                              len(results) - len(missing))
+
+        if missing:
+            try:
+                tagged = self.tagger.tag_many(missing)
+            except TaggingError:
+                tagged = [self._tag(key) for key in missing]
+            for key, words in zip(missing, tagged):
+                queries = ()
+                if words is not None:
+                    queries = tuple(self._generate(expression, userdata)
+                                    for expression, userdata
+                                    in self._iter_interpretations(words))
+                results[key] = queries
+                if cache is not None:
+                    cache.set((key, self.language), queries)
+
+        return [_copy_queries(results[key]) for key in keys]
+
+    def get_matches(self, words):
+        """
+        Given the list of tagged `words` of a question, it returns the list
+        of pairs ``(rule, match)`` of the rules that match them, in weight
+        order. The match is the one `QuestionTemplate.match` gives.
+        """
+
+        return list(self._iter_matches(words))
+
+    def _iter_queries(self, question):
+        """
+        Iterates over the triples returned by `get_queries`.
+        """
+
         for expression, userdata in self._iter_compiled_forms(question):
-            target, query = generation.get_code(expression, self.language)
-            message = u"Interpretation {1}: {0}"
-            logger.debug(message.format(str(expression),
-                         expression.rule_used))
-            logger.debug(u"Query generated: {0}".format(query))
-            yield target, query, userdata
+            yield self._generate(expression, userdata)
+
+    def _generate(self, expression, userdata):
+        """
+        Returns the triple ``(target, query, userdata)`` for `expression`.
+        """
+
+        target, query = generation.get_code(expression, self.language)
+        message = u"Interpretation {1}: {0}"
+        logger.debug(message.format(str(expression),
+                     expression.rule_used))
+        logger.debug(u"Query generated: {0}".format(query))
+        return target, query, userdata
 
     def _iter_compiled_forms(self, question):
         """
         Returns all the compiled form of the question.
         """
 
+        words = self._tag(question)
+        if words is None:
+            return []
+        return self._iter_interpretations(words)
+
+    def _tag(self, question):
+        """
+        Returns the list of tagged words of `question` or ``None`` if it
+        can't be tagged.
+        """
+
         try:
             words = list(self.tagger(question))
         except TaggingError:
             logger.warning(u"Can't parse tagger's output for: '%s'",
                            question)
-            return
+            return None
 
         logger.debug(u"Tagged question:\n" +
                      u"\n".join(u"\t{}".format(w for w in words)))
+        return words
+
+    def _iter_interpretations(self, words):
+        """
+        Iterates over the pairs ``(expression, userdata)`` of the rules that
+        match the tagged `words`.
+        """
 
-        for rule in self.rules:
-            expression, userdata = rule.get_interpretation(words)
+        # Particles are interpreted once per question
+        interpretations = {}
+        for rule, match in self._iter_matches(words):
+            expression, userdata = rule.get_match_interpretation(
+                match, words, interpretations)
             if expression:
                 yield expression, userdata
 
+    def _iter_matches(self, words):
+        """
+        Iterates over the pairs ``(rule, match)`` of the rules that match
+        `words`, in weight order.
+        """
+
+        if self.columnar_matcher:
+            words = ColumnarSentence(words, self._get_vocabulary())
+
+        collecting = metrics.collecting()
+        start = time.time()
+        if self.union_matcher:
+            union = self._get_union_program()
+            matches = union.match(words)
+            if collecting:
+                metrics.timing(u"matching", time.time() - start)
+                metrics.increment(u"rules_tried", len(self.rules))
+                metrics.increment(u"rules_matched", len(matches))
+            for n, match in matches:
+                yield self.rules[n], match
+            return
+
+        rules = self._get_rule_index().candidates(words)
+        logger.debug(u"Trying {0} of {1} rules".format(len(rules),
+                                                      len(self.rules)))
+        if collecting:
+            metrics.increment(u"rules_tried", len(rules))
+        matching = 0.0
+        try:
+            for rule in rules:
+                logger.debug(u"Trying to match with regex: {0}".format(
+                             rule.__class__.__name__))
+                match = rule.match(words)
+                if match:
+                    if collecting:
+                        metrics.increment(u"rules_matched")
+                    matching += time.time() - start
+                    start = None
+                    yield rule, match
+                    start = time.time()
+        finally:
+            # Also when the caller stops iterating
+            if collecting:
+                if start is not None:
+                    matching += time.time() - start
+                metrics.timing(u"matching", matching)
+
+    def _get_rule_index(self):
+        """
+        Returns the index of `self.rules`, rebuilding it if the rules were
+        modified after the app was installed.
+        """
+
+        if self._rule_index.rules != self.rules:
+            self._rule_index = RuleIndex(self.rules)
+        return self._rule_index
+
+    def _get_union_program(self):
+        """
+        Returns a program that matches all of `self.rules` at once, building
+        it if needed.
+        """
+
+        if self._union_rules != self.rules:
+            programs = [rule.get_program() for rule in self.rules]
+            self._union_program = UnionProgram(programs)
+            self._union_rules = list(self.rules)
+        return self._union_program
+
+    def _get_vocabulary(self):
+        """
+        Returns the vocabulary of the strings that the rules look for,
+        building it if needed.
+        """
+
+        if self._vocabulary_rules != self.rules:
+            vocabulary = Vocabulary()
+            if self.union_matcher:
+                self._get_union_program().column_code(vocabulary)
+            else:
+                for rule in self.rules:
+                    program = rule.get_program()
+                    if isinstance(program, Program):
+                        program.column_code(vocabulary)
+            self._vocabulary = vocabulary
+            self._vocabulary_rules = list(self.rules)
+        return self._vocabulary
+
+    def _get_query_cache(self):
+        """
+        Returns the query cache (or ``None`` if it's disabled), clearing it
+        if the rules, the language or the settings changed since the last
+        time it was used.
+        """
+
+        if self._query_cache is None:
+            return None
+        if not self._query_cache_is_current():
+            self._query_cache.clear()
+            self._query_cache_fingerprint = (tuple(self.rules), self.language,
+                                             len(vars(settings)),
+                                             _settings_values())
+        return self._query_cache
+
+    def _query_cache_is_current(self):
+        """
+        Checks that the rules, the language and the settings are the same
+        objects as when the query cache was cleared.
+        Values are compared by identity, so checking is cheap.
+        """
+
+        fingerprint = self._query_cache_fingerprint
+        if fingerprint is None:
+            return False
+        rules, language, size, values = fingerprint
+        if language != self.language or len(rules) != len(self.rules):
+            return False
+        for rule, current in zip(rules, self.rules):
+            if rule is not current:
+                return False
+        current = vars(settings)
+        if len(current) != size:
+            return False
+        for key, value in values.iteritems():
+            if current.get(key, _missing) is not value:
+                return False
+        return True
+
     def _save_settings_values(self):
         """
         Persists the settings values of the app to the settings module
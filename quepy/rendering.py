@@ -0,0 +1,124 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Rendering of dot graphs into images.
+
+The dot source is piped to the graphviz program over stdin, so there are no
+temporary files, and the images are remembered by a hash of the source, in
+memory or, with an `ImageCache`, in a folder that outlives the process.
+"""
+
+import os
+import errno
+import hashlib
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+from quepy.cache import LRUCache, atomic_write
+
+DOT_PROGRAM = "dot"
+
+_images = LRUCache(256)
+
+
+def _key(dot_source, format):
+    return format, hashlib.sha1(dot_source).hexdigest()
+
+
+class ImageCache(object):
+    """
+    Cache of images stored as files of the folder `path`, named by the key
+    of the source and the format.
+    The most recent images are also kept in the cache `memory`.
+    """
+
+    def __init__(self, path, memory=None):
+        self.path = path
+        self.memory = LRUCache(256) if memory is None else memory
+
+    def _filename(self, key):
+        format, digest = key
+        return os.path.join(self.path, u"{}.{}".format(digest, format))
+
+    def get(self, key, default=None):
+        """
+        Returns the image stored for `key` or `default` if there is none.
+        """
+        image = self.memory.get(key)
+        if image is not None:
+            return image
+        try:
+            with open(self._filename(key), "rb") as filehandler:
+                image = filehandler.read()
+        except IOError:
+            return default
+        self.memory.set(key, image)
+        return image
+
+    def set(self, key, image):
+        """
+        Stores `image` for `key` (see `atomic_write`).
+        """
+        self.memory.set(key, image)
+        try:
+            os.makedirs(self.path)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        atomic_write(self._filename(key), image)
+
+
+def render(dot_source, format="png", program=DOT_PROGRAM, cache=_images):
+    """
+    Returns the image (a str) of the graph `dot_source` in the `format`
+    supported by graphviz.
+    Raises OSError if `program` is not found and ValueError if it fails.
+    The images are stored in `cache` (None disables it).
+    """
+    if isinstance(dot_source, unicode):
+        dot_source = dot_source.encode("utf-8")
+
+    if cache is not None:
+        key = _key(dot_source, format)
+        image = cache.get(key)
+        if image is not None:
+            return image
+
+    call = subprocess.Popen([program, "-T" + format], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    image, error = call.communicate(dot_source)
+    if call.returncode != 0:
+        message = u"'{}' returned error code {}: {}"
+        raise ValueError(message.format(program, call.returncode,
+                                        error.decode("utf-8", "replace")))
+
+    if cache is not None:
+        cache.set(key, image)
+    return image
+
+
+def render_many(dot_sources, format="png", jobs=4, program=DOT_PROGRAM,
+                cache=_images):
+    """
+    Renders every graph of `dot_sources` like `render` using up to `jobs`
+    concurrent processes of `program`.
+    Returns the list of images in the same order as `dot_sources`.
+    """
+    dot_sources = list(dot_sources)
+    if jobs == 1 or len(dot_sources) < 2:
+        return [render(x, format, program, cache) for x in dot_sources]
+
+    pool = ThreadPool(min(jobs, len(dot_sources)))
+    try:
+        return pool.map(lambda x: render(x, format, program, cache),
+                        dot_sources)
+    finally:
+        pool.close()
+        pool.join()
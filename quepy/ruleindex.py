@@ -0,0 +1,165 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Static analysis of the regexes of ``QuestionTemplate`` instances.
+
+A regex is reduced to three facts:
+
+    - ``nullable``: whether it can match the empty sentence.
+    - ``first``: the set of word keys one of which the first word of a
+                 matching sentence must have, or ``None`` if any word could
+                 start a match.
+    - ``required``: a set of word keys that must all appear somewhere in a
+                    matching sentence.
+
+A *word key* is a pair ``(attribute, value)`` like ``(u"lemma", u"who")``.
+Only the ``Pos``, ``Lemma`` and ``Token`` predicates produce keys, any other
+predicate is considered to match any word.
+
+``RuleIndex`` uses that information to select, for a given tagged
+question, the rules that could possibly match it.
+"""
+
+from collections import defaultdict
+from refo import Predicate, Disjunction, Concatenation, Star, Plus, \
+    Question, Group, Repetition
+
+from quepy.parsing import Pos, Lemma, Token
+
+_predicate_attrs = {
+    Pos: u"pos",
+    Lemma: u"lemma",
+    Token: u"token",
+}
+
+
+def predicate_key(predicate):
+    """
+    Returns the word key checked by `predicate` or ``None`` if it's not a
+    plain ``Pos``, ``Lemma`` or ``Token`` predicate.
+    """
+    # Exact type on purpose: subclasses may redefine what they check.
+    attr = _predicate_attrs.get(type(predicate))
+    if attr is None:
+        return None
+    return attr, predicate.tag
+
+
+def word_keys(word):
+    """
+    Returns the word keys of `word`.
+    """
+    return (u"pos", word.pos), (u"lemma", word.lemma), (u"token", word.token)
+
+
+def analyse(pattern):
+    """
+    Returns a tuple ``(nullable, first, required)`` for the refo `pattern`.
+    See the module documentation for their meaning.
+    """
+    if isinstance(pattern, Predicate):
+        key = predicate_key(pattern)
+        if key is None:
+            return False, None, frozenset()
+        key = frozenset([key])
+        return False, key, key
+
+    if isinstance(pattern, Group):  # Includes Particles
+        return analyse(pattern.x)
+
+    if isinstance(pattern, Disjunction):
+        a_nullable, a_first, a_required = analyse(pattern.a)
+        b_nullable, b_first, b_required = analyse(pattern.b)
+        if a_first is None or b_first is None:
+            first = None
+        else:
+            first = a_first | b_first
+        return a_nullable or b_nullable, first, a_required & b_required
+
+    if isinstance(pattern, Concatenation):
+        nullable = True
+        first = frozenset()
+        required = frozenset()
+        for x in pattern.xs:
+            x_nullable, x_first, x_required = analyse(x)
+            if nullable:
+                if first is None or x_first is None:
+                    first = None
+                else:
+                    first = first | x_first
+            nullable = nullable and x_nullable
+            required = required | x_required
+        return nullable, first, required
+
+    if isinstance(pattern, (Star, Question)):
+        _, first, _ = analyse(pattern.x)
+        return True, first, frozenset()
+
+    if isinstance(pattern, Plus):
+        return analyse(pattern.x)
+
+    if isinstance(pattern, Repetition):
+        if pattern.mx == 0:
+            return True, frozenset(), frozenset()
+        nullable, first, required = analyse(pattern.x)
+        if pattern.mn == 0:
+            return True, first, frozenset()
+        return nullable, first, required
+
+    # Unknown kind of pattern, assume it could match anything.
+    return True, None, frozenset()
+
+
+class RuleIndex(object):
+    """
+    Indexes a list of rules by the words that can start a match.
+    """
+
+    def __init__(self, rules):
+        """
+        `rules` is a list of ``QuestionTemplate`` instances in the order
+        they should be tried.
+        """
+        self.rules = list(rules)
+        self._by_first = defaultdict(list)
+        self._any_first = []
+        self._nullable = []
+        self._required = []
+
+        for i, rule in enumerate(self.rules):
+            nullable, first, required = analyse(rule.regex)
+            if nullable:
+                self._nullable.append(i)
+            if first is None:
+                self._any_first.append(i)
+            else:
+                for key in first:
+                    self._by_first[key].append(i)
+            self._required.append(required)
+
+    def candidates(self, words):
+        """
+        Returns the rules that could match the list of `words`, in the same
+        order given when the index was built.
+        """
+        if not words:
+            return [self.rules[i] for i in self._nullable]
+
+        positions = set(self._any_first)
+        for key in word_keys(words[0]):
+            positions.update(self._by_first.get(key, ()))
+        if not positions:
+            return []
+
+        keys = set()
+        for word in words:
+            keys.update(word_keys(word))
+        return [self.rules[i] for i in sorted(positions)
+                if self._required[i] <= keys]
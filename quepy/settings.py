@@ -16,11 +16,32 @@ LANGUAGE = "sparql"
 
 # NLTK config
 NLTK_DATA_PATH = []  # List of paths with NLTK data
+NLTK_LEMMA_TABLE = None  # Path to a lemma table saved with 'quepy lemmas'
+NLTK_LEMMA_MEMO_SIZE = 100000  # Amount of lemmas to remember
+
+# Tagger config
+TAGGER = "nltk"  # "nltk", "cached-lexicon" or "module:function"
+TAGGER_LEXICON = None  # Path to the lexicon used by "cached-lexicon"
+TAGGER_CACHE_SIZE = 0  # Amount of tagged questions to remember, 0 disables
+TAGGER_CACHE_TTL = None  # Seconds to remember a tagged question, None forever
+
+# Parsing config
+UNION_MATCHER = False  # Match all the rules at once in a single pass
+COLUMNAR_MATCHER = False  # Match interned ids instead of strings
+QUERY_CACHE_SIZE = 0  # Amount of questions to remember the queries of
+
+# Metrics config
+METRICS_COLLECTORS = []  # "module:attribute" of the collectors to register
 
 # Encoding config
 DEFAULT_ENCODING = "utf-8"
 
+# MQL config
+MQL_COMPACT = False  # Generate MQL queries without indentation
+
 # Sparql config
+SPARQL_SKELETON_CACHE_SIZE = 1024  # Amount of query shapes to remember
+SPARQL_PRUNE_PREAMBLE = False  # Leave out the PREFIXes a query doesn't use
 SPARQL_PREAMBLE = u"""
 PREFIX owl: <http://www.w3.org/2002/07/owl#>
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
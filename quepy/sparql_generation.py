@@ -4,22 +4,48 @@
 Sparql generation code.
 """
 
+import re
 from quepy import settings
+from quepy.cache import LRUCache
 from quepy.dsl import IsRelatedTo
 from quepy.expression import isnode
 from quepy.encodingpolicy import assert_valid_encoding
 
 _indent = u"  "
+_SLOT = object()  # Place of a literal in the shape of an expression
+_skeletons = None
+
+# Characters removed by `escape` and characters that can't be escaped.
+_removed = dict.fromkeys(map(ord, u"\n\r\t\x0b"))
+_invalid = re.compile(u"[\x01-\x1e]")
+
+_prefix_declaration = re.compile(
+    r"\bPREFIX[ \t]+([^\s:]*):[ \t]*<[^>]*>[ \t]*", re.IGNORECASE)
+
+# Memo of `escape`, of `escape(adapt(x))` for unicode strings and of the
+# pruned preambles.
+_MEMO_SIZE = 10000
+_escaped = {}
+_escaped_literals = {}
+_preambles = {}
 
 
 def escape(string):
-    string = unicode(string)
-    string = string.replace("\n", "")
-    string = string.replace("\r", "")
-    string = string.replace("\t", "")
-    string = string.replace("\x0b", "")
-    if not string or any([x for x in string if 0 < ord(x) < 31]) or \
-            string.startswith(":") or string.endswith(":"):
+    if type(string) is unicode:
+        try:
+            return _escaped[string]
+        except KeyError:
+            pass
+        result = _escape(string)
+        _remember(_escaped, string, result)
+        return result
+    return _escape(unicode(string))
+
+
+def _escape(string):
+    string = string.translate(_removed)
+    if not string or _invalid.search(string) or \
+            string.startswith(u":") or string.endswith(u":"):
         message = "Unable to generate sparql: invalid nodes or relation"
         raise ValueError(message)
     return string
@@ -37,29 +63,184 @@ def adapt(x):
     return unicode(x)
 
 
+def escape_literal(x):
+    """
+    Returns ``escape(adapt(x))``.
+    """
+    # Only unicode is remembered, str must fail in `adapt` and would be
+    # found in the memo when equal to a unicode string.
+    if type(x) is unicode:
+        try:
+            return _escaped_literals[x]
+        except KeyError:
+            pass
+        result = escape(adapt(x))
+        _remember(_escaped_literals, x, result)
+        return result
+    return escape(adapt(x))
+
+
+def _remember(memo, key, value):
+    if len(memo) >= _MEMO_SIZE:
+        memo.clear()
+    memo[key] = value
+
+
 def expression_to_sparql(e, full=False):
-    template = u"{preamble}\n" +\
-               u"SELECT DISTINCT {select} WHERE {{\n" +\
-               u"{expression}\n" +\
-               u"}}\n"
-    head = adapt(e.get_head())
+    """
+    Returns the pair ``(select, sparql)`` for the expression `e`.
+
+    The query is made of a skeleton that depends only on the shape of the
+    expression (its nodes and relations) and the literal values of its data.
+    Skeletons are remembered (see the ``SPARQL_SKELETON_CACHE_SIZE``
+    setting), so for an already seen shape only the literals are escaped.
+    """
+    shape, literals = _shape(e)
+    prune = getattr(settings, "SPARQL_PRUNE_PREAMBLE", False)
+    key = shape, e.get_head(), full, settings.SPARQL_PREAMBLE, prune
+    cache = _get_skeleton_cache()
+    skeleton = None
+    if cache is not None:
+        try:
+            skeleton = cache.get(key)
+        except TypeError:  # Unhashable relations
+            cache = None
+    if skeleton is None:
+        skeleton = _skeleton(shape, e.get_head(), full)
+        if cache is not None:
+            cache.set(key, skeleton)
+
+    select, parts, slots, prefixes = skeleton
+    parts = list(parts)
+    for slot, value in zip(slots, literals):
+        parts[slot] = escape_literal(value)
+    if prune:
+        used = set(prefixes)
+        for slot in slots:
+            used.add(term_prefix(parts[slot]))
+        parts[0] = pruned_preamble(settings.SPARQL_PREAMBLE, used)
+    else:
+        parts[0] = settings.SPARQL_PREAMBLE
+    return select, u"".join(parts)
+
+
+def term_prefix(term):
+    """
+    Returns the prefix of `term` if it's a prefixed name (or a literal with a
+    prefixed datatype) or ``None`` otherwise.
+    """
+    if term.startswith(u"\""):
+        i = term.rfind(u"\"^^")
+        if i == -1:
+            return None
+        term = term[i + 3:]
+    if term.startswith(u"<") or term.startswith(u"?"):
+        return None
+    i = term.find(u":")
+    if i == -1:
+        return None
+    return term[:i]
+
+
+def pruned_preamble(preamble, prefixes):
+    """
+    Returns `preamble` without the ``PREFIX`` declarations of the prefixes
+    that are not in `prefixes`. Every declaration is considered on its own,
+    even if a line has many, and lines left empty are removed.
+    """
+    key = preamble, frozenset(prefixes)
+    try:
+        return _preambles[key]
+    except KeyError:
+        pass
+
+    def keep_used(match):
+        if match.group(1) in prefixes:
+            return match.group(0)
+        return u""
+
+    lines = []
+    for line in preamble.splitlines(True):
+        kept = _prefix_declaration.sub(keep_used, line)
+        if kept == line or kept.strip():
+            lines.append(kept)
+    result = u"".join(lines)
+    _remember(_preambles, key, result)
+    return result
+
+
+def _shape(e):
+    """
+    Returns the edges of `e` as a tuple of triples ``(node, relation, dest)``
+    where literal destinations are replaced by `_SLOT`, and the list of those
+    literals in the same order.
+    """
+    shape = []
+    literals = []
+    for node in e.iter_nodes():
+        for relation, dest in e.iter_edges(node):
+            if not isnode(dest):
+                literals.append(dest)
+                dest = _SLOT
+            shape.append((node, relation, dest))
+    return tuple(shape), literals
+
+
+def _skeleton(shape, head, full):
+    """
+    Builds the skeleton of the query for `shape`: the tuple
+    ``(select, parts, slots, prefixes)`` where `parts` is a list of strings
+    that joined make the query once the first one is replaced by the
+    preamble and the ones at the indexes `slots` by the literals.
+    `prefixes` are the ones used outside of the literals.
+    """
+    head = adapt(head)
     if full:
         select = u"*"
     else:
         select = head
+
+    # Text between slots is joined, so filling a skeleton joins only
+    # 2 * len(slots) + 2 strings. The first part is for the preamble.
+    parts = [None]
+    slots = []
+    prefixes = set()
+    buf = [u"\nSELECT DISTINCT ", select, u" WHERE {\n"]
     y = 0
-    xs = []
-    for node in e.iter_nodes():
-        for relation, dest in e.iter_edges(node):
-            if relation is IsRelatedTo:
-                relation = u"?y{}".format(y)
-                y += 1
-            xs.append(triple(adapt(node), relation, adapt(dest),
-                      indentation=1))
-    sparql = template.format(preamble=settings.SPARQL_PREAMBLE,
-                             select=select,
-                             expression=u"\n".join(xs))
-    return select, sparql
+    for n, (node, relation, dest) in enumerate(shape):
+        if relation is IsRelatedTo:
+            relation = u"?y{}".format(y)
+            y += 1
+        relation = escape(relation)
+        prefixes.add(term_prefix(relation))
+        if n:
+            buf.append(u"\n")
+        buf.extend((_indent, escape(adapt(node)), u" ", relation, u" "))
+        if dest is _SLOT:
+            parts.append(u"".join(buf))
+            slots.append(len(parts))
+            parts.append(None)
+            buf = []
+        else:
+            buf.append(escape(adapt(dest)))
+        buf.append(u".")
+    buf.append(u"\n}\n")
+    parts.append(u"".join(buf))
+    prefixes.discard(None)
+    return select, parts, slots, frozenset(prefixes)
+
+
+def _get_skeleton_cache():
+    """
+    Returns the cache of skeletons or ``None`` if it's disabled.
+    """
+    global _skeletons
+    size = getattr(settings, "SPARQL_SKELETON_CACHE_SIZE", 0)
+    if not size:
+        return None
+    if _skeletons is None or _skeletons.size != size:
+        _skeletons = LRUCache(size)
+    return _skeletons
 
 
 def triple(a, p, b, indentation=0):
@@ -7,9 +7,12 @@
 # Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
 #          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
 
+import time
 import logging
+from importlib import import_module
 
-from quepy import settings
+from quepy import settings, metrics
+from quepy.cache import LRUCache
 from quepy.encodingpolicy import assert_valid_encoding
 
 logger = logging.getLogger("quepy.tagger")
@@ -30,20 +33,61 @@ class Word(object):
     Representation of a tagged word.
     Contains *token*, *lemma*, *pos tag* and optionally a *probability* of
     that tag.
+    Words are immutable and compare equal if all their attributes do, so
+    they can be used as dict keys.
     """
+    __slots__ = ("token", "lemma", "pos", "prob")
     _encoding_attrs = u"token lemma pos".split()
     _attrs = _encoding_attrs + [u"prob"]
 
     def __init__(self, token, lemma=None, pos=None, prob=None):
-        self.pos = pos
-        self.prob = prob
-        self.lemma = lemma
-        self.token = token
+        for value in (token, lemma, pos):
+            if value is not None:
+                assert_valid_encoding(value)
+        _set_token(self, token)
+        _set_lemma(self, lemma)
+        _set_pos(self, pos)
+        _set_prob(self, prob)
+
+    @classmethod
+    def trusted(cls, token, lemma=None, pos=None, prob=None):
+        """
+        Builds a word without checking the encoding of its attributes.
+        For taggers that already guarantee that they are unicode.
+        """
+        word = _new(cls)
+        _set_token(word, token)
+        _set_lemma(word, lemma)
+        _set_pos(word, pos)
+        _set_prob(word, prob)
+        return word
 
     def __setattr__(self, name, value):
-        if name in self._encoding_attrs and value is not None:
-            assert_valid_encoding(value)
-        object.__setattr__(self, name, value)
+        message = u"'Word' object attribute '{}' is read-only"
+        raise AttributeError(message.format(name))
+
+    def __delattr__(self, name):
+        message = u"'Word' object attribute '{}' is read-only"
+        raise AttributeError(message.format(name))
+
+    def _key(self):
+        return self.token, self.lemma, self.pos, self.prob
+
+    def __eq__(self, other):
+        if not isinstance(other, Word):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        if not isinstance(other, Word):
+            return NotImplemented
+        return self._key() != other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return Word, self._key()
 
     def __unicode__(self):
         attrs = (getattr(self, name, u"-") for name in self._attrs)
@@ -53,22 +97,281 @@ class Word(object):
         return unicode(self)
 
 
-def get_tagger():
+_new = object.__new__
+_set_token = Word.token.__set__
+_set_lemma = Word.lemma.__set__
+_set_pos = Word.pos.__set__
+_set_prob = Word.prob.__set__
+
+
+def normalize(string):
     """
-    Return a tagging function given some app settings.
-    `Settings` is the settings module of an app.
-    The returned value is a function that receives a unicode string and returns
-    a list of `Word` instances.
+    Returns `string` with runs of whitespace collapsed into a single space
+    and without leading or trailing whitespace.
+    Tokenization splits on whitespace, so tagging a string or its
+    normalization gives the same result.
     """
-    from quepy.nltktagger import run_nltktagger
-    tagger_function = lambda x: run_nltktagger(x, settings.NLTK_DATA_PATH)
+    return u" ".join(string.split())
 
-    def wrapper(string):
+
+class Tagger(object):
+    """
+    Callable that receives a unicode string and returns a list of `Word`
+    instances.
+    Results are memoised in `cache` by normalized string. Each call returns
+    new `Word` instances, so callers can't corrupt cached entries.
+    """
+
+    def __init__(self, function, cache=None, batch_function=None,
+                 warmup_function=None):
+        """
+        `function` does the actual tagging. `cache` is an object with the
+        ``get``/``set`` interface of `quepy.cache.LRUCache` or ``None`` to
+        disable caching.
+        `batch_function`, if given, tags a list of strings at once and
+        returns a list of lists of words. It's used by `tag_many`.
+        `warmup_function`, if given, loads the resources needed by
+        `function`. It's used by `warmup`.
+        """
+        self.function = function
+        self.cache = cache
+        self.batch_function = batch_function
+        self.warmup_function = warmup_function
+
+    def __call__(self, string):
         assert_valid_encoding(string)
-        words = tagger_function(string)
+        if not metrics.collecting():
+            return self._lookup(string)
+        start = time.time()
+        words = self._lookup(string)
+        metrics.timing(u"tagging", time.time() - start)
+        return words
+
+    def _lookup(self, string):
+        if self.cache is None:
+            return self._tag(string)
+
+        key = normalize(string)
+        entry = self.cache.get(key)
+        if entry is None:
+            metrics.increment(u"tagger_cache_misses")
+            words = self._tag(key)
+            self.cache.set(key, _freeze(words))
+            return words
+        metrics.increment(u"tagger_cache_hits")
+        return _thaw(entry)
+
+    def tag_many(self, strings):
+        """
+        Tags all the unicode strings of the list `strings` and returns a list
+        with the list of words of each one of them.
+        Repeated strings are tagged only once and the strings that are not
+        cached are tagged in a single batch.
+        """
+        for string in strings:
+            assert_valid_encoding(string)
+
+        start = time.time()
+        keys = [normalize(string) for string in strings]
+        entries = {}
+        missing = []
+        for key in keys:
+            if key in entries:
+                continue
+            entry = None
+            if self.cache is not None:
+                entry = self.cache.get(key)
+            if entry is None:
+                missing.append(key)
+            entries[key] = entry
+
+        if missing:
+            if self.batch_function is None:
+                tagged = [self.function(key) for key in missing]
+            else:
+                tagged = self.batch_function(missing)
+            for key, words in zip(missing, tagged):
+                self._check(words)
+                entries[key] = _freeze(words)
+                if self.cache is not None:
+                    self.cache.set(key, entries[key])
+
+        result = [_thaw(entries[key]) for key in keys]
+        if metrics.collecting():
+            if self.cache is not None:
+                metrics.increment(u"tagger_cache_misses", len(missing))
+                metrics.increment(u"tagger_cache_hits",
+                                  len(entries) - len(missing))
+            metrics.timing(u"tagging_batch", time.time() - start)
+        return result
+
+    def warmup(self):
+        """
+        Loads the resources used for tagging so tagging the first question
+        doesn't have to.
+        Returns the amount of seconds it took.
+        """
+        start = time.time()
+        if self.warmup_function is not None:
+            self.warmup_function()
+        elapsed = time.time() - start
+        logger.info(u"Tagger resources loaded in {0:.2f} seconds".format(
+                    elapsed))
+        return elapsed
+
+    def _tag(self, string):
+        words = self.function(string)
+        self._check(words)
+        return words
+
+    def _check(self, words):
         for word in words:
             if word.pos not in PENN_TAGSET:
                 logger.warning("Tagger emmited a non-penn "
                                "POS tag {!r}".format(word.pos))
-        return words
-    return wrapper
+
+
+def _freeze(words):
+    return tuple((word.token, word.lemma, word.pos, word.prob)
+                 for word in words)
+
+
+def _thaw(entry):
+    # Entries were checked when the words were first built.
+    trusted = Word.trusted
+    return [trusted(*attrs) for attrs in entry]
+
+
+class TaggerBackend(object):
+    """
+    Base class for the objects that do the actual tagging.
+    Subclass from this and register it with `register_backend` to use it
+    with the `TAGGER` setting.
+    """
+
+    def tag(self, string):
+        """
+        Tags the unicode `string` and returns a list of `Word` instances.
+        """
+        raise NotImplementedError()
+
+    def tag_many(self, strings):
+        """
+        Tags every string of the list `strings` and returns a list with the
+        list of words of each one of them.
+        """
+        return [self.tag(string) for string in strings]
+
+    def warmup(self):
+        """
+        Loads the resources used by `tag`.
+        """
+
+    def version(self):
+        """
+        Returns a unicode string that changes whenever the output of `tag`
+        may change, used to key tagging results saved on disk.
+        """
+        cls = type(self)
+        return u"{}.{}".format(cls.__module__, cls.__name__)
+
+
+class FunctionBackend(TaggerBackend):
+    """
+    Backend for a plain function that receives a unicode string and returns
+    a list of `Word` instances.
+    """
+
+    def __init__(self, function):
+        self.function = function
+
+    def tag(self, string):
+        return self.function(string)
+
+    def version(self):
+        function = self.function
+        return u"{}.{}".format(getattr(function, "__module__", None),
+                               getattr(function, "__name__", None))
+
+
+_backends = {
+    u"nltk": u"quepy.nltktagger:NLTKBackend",
+    u"cached-lexicon": u"quepy.lexicontagger:LexiconBackend",
+}
+_instances = {}  # Backend instances by name
+
+
+def register_backend(name, backend):
+    """
+    Makes `backend` available as `name` for the `TAGGER` setting.
+    `backend` is a `TaggerBackend` subclass or instance, a tagging function or
+    a ``"module:attribute"`` string pointing to any of those.
+    """
+    _backends[name] = backend
+    _instances.pop(name, None)
+
+
+def get_backend(name=None):
+    """
+    Returns a `TaggerBackend` instance for the tagger called `name`, which
+    is a name given to `register_backend` or a ``"module:attribute"``
+    string. Defaults to the `TAGGER` setting.
+    The instance is built once per name, so warming it up warms the taggers
+    of every app using it.
+    """
+    if name is None:
+        name = getattr(settings, "TAGGER", u"nltk")
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+
+    backend = _backends.get(name, name)
+    if isinstance(backend, basestring):
+        if u":" not in backend:
+            raise ValueError(u"Unknown tagger {!r}".format(name))
+        module_name, attr = backend.split(u":", 1)
+        backend = getattr(import_module(module_name), attr)
+
+    if isinstance(backend, type) and issubclass(backend, TaggerBackend):
+        backend = backend()
+    elif not isinstance(backend, TaggerBackend):
+        if not callable(backend):
+            raise ValueError(u"Invalid tagger {!r}".format(name))
+        backend = FunctionBackend(backend)
+    _instances[name] = backend
+    return backend
+
+
+def get_tagger(cache=None):
+    """
+    Return a tagging function given some app settings.
+    `Settings` is the settings module of an app.
+    The returned value is a `Tagger`, a callable that receives a unicode string
+    and returns a list of `Word` instances.
+    The tagging itself is done by the backend chosen with the `TAGGER`
+    setting (see `get_backend`).
+    If `cache` is not given one is built from the `TAGGER_CACHE_SIZE` and
+    `TAGGER_CACHE_TTL` settings (a size of 0 disables it).
+    """
+    backend = get_backend()
+
+    if cache is None:
+        size = getattr(settings, "TAGGER_CACHE_SIZE", 0)
+        if size:
+            ttl = getattr(settings, "TAGGER_CACHE_TTL", None)
+            cache = LRUCache(size, ttl)
+    return Tagger(backend.tag, cache, backend.tag_many, backend.warmup)
+
+
+def warmup():
+    """
+    Loads the resources used by the tagger chosen in the settings (the POS
+    tagger model and WordNet for NLTK) so tagging the first question doesn't
+    have to.
+    It warms the backend instance shared by the taggers of the apps (see
+    `get_backend`).
+    Returns the amount of seconds it took.
+    """
+    backend = get_backend()
+    return Tagger(backend.tag, warmup_function=backend.warmup).warmup()
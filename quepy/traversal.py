@@ -0,0 +1,164 @@
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Traversal of ``Expression`` graphs shared by the code generators.
+
+`get_traversal` lists the edges of an expression once and keeps them until
+the expression is modified, the adjacency lists are built from them the
+first time they are used. Every operation takes time linear in the
+size of the expression (paths are linear in their length).
+"""
+
+from collections import deque
+
+from quepy.expression import isnode
+
+
+class Traversal(object):
+    """
+    Adjacency of an expression.
+
+    - `edges` is the list of triples ``(node, relation, dest)`` in the order
+      of ``iter_nodes`` and ``iter_edges``.
+    - `forward[node]` is the list of pairs ``(relation, dest)`` of `node`.
+    - `reverse[node]` is the list of pairs ``(relation, source)`` of the
+      edges that go into `node`.
+    - `neighbours[node]` is the list of triples ``(relation, other,
+      reversed)`` for the edges in both directions, where `reversed` is
+      ``True`` for the ones that go into `node`. Edges are listed in the
+      order they are found in `edges`.
+    """
+
+    def __init__(self, expression):
+        self.size = len(expression)
+        self.edges = [(node, relation, dest)
+                      for node in expression.iter_nodes()
+                      for relation, dest in expression.iter_edges(node)]
+        self._forward = None
+        self._reverse = None
+        self._neighbours = None
+        self._trees = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def forward(self):
+        if self._forward is None:
+            forward = [[] for _ in xrange(self.size)]
+            for node, relation, dest in self.edges:
+                forward[node].append((relation, dest))
+            self._forward = forward
+        return self._forward
+
+    @property
+    def reverse(self):
+        if self._reverse is None:
+            reverse = [[] for _ in xrange(self.size)]
+            for node, relation, dest in self.edges:
+                if isnode(dest):
+                    reverse[dest].append((relation, node))
+            self._reverse = reverse
+        return self._reverse
+
+    @property
+    def neighbours(self):
+        if self._neighbours is None:
+            neighbours = [[] for _ in xrange(self.size)]
+            for node, relation, dest in self.edges:
+                if isnode(dest):
+                    neighbours[dest].append((relation, node, True))
+                neighbours[node].append((relation, dest, False))
+            self._neighbours = neighbours
+        return self._neighbours
+
+    def tree(self, root):
+        """
+        Returns the `Tree` of the expression hanging from `root`.
+        """
+        try:
+            return self._trees[root]
+        except KeyError:
+            tree = Tree(self, root)
+            self._trees[root] = tree
+            return tree
+
+
+class Tree(object):
+    """
+    An expression seen as a tree hanging from the node `root` (expressions
+    are trees if the direction of the edges is ignored).
+
+    - `order` is the list of the nodes in breadth first order.
+    - `parents[node]` is the triple ``(parent, relation, reversed)`` of the
+      edge that leads from the parent to `node` (see
+      `Traversal.neighbours`). ``parents[root]`` is ``None``.
+    """
+
+    def __init__(self, traversal, root):
+        self.root = root
+        self.order, self.parents = breadth_first(traversal.neighbours, root)
+
+    def post_order(self):
+        """
+        Returns the list of nodes such that every node is preceded by its
+        children.
+        """
+        return self.order[::-1]
+
+    def path(self, node):
+        """
+        Returns the list of pairs ``(relation, reversed)`` of the edges that
+        lead from `root` to `node`.
+        """
+        path = []
+        while self.parents[node] is not None:
+            node, relation, reversed_ = self.parents[node]
+            path.append((relation, reversed_))
+        path.reverse()
+        return path
+
+
+def breadth_first(neighbours, root):
+    """
+    Walks the tree hanging from `root`, where `neighbours[node]` is a
+    sequence of tuples with the other node (or a data) as second item.
+    Returns the list of the nodes in breadth first order and a dict from
+    every node to the tuple of its parent followed by the other items of the
+    tuple that leads to the node (``None`` for `root`).
+    """
+    order = [root]
+    parents = {root: None}
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        for edge in neighbours[node]:
+            other = edge[1]
+            if isnode(other) and other not in parents:
+                parents[other] = (node, edge[0]) + tuple(edge[2:])
+                order.append(other)
+                queue.append(other)
+    return order, parents
+
+
+def get_traversal(expression):
+    """
+    Returns the `Traversal` of `expression`.
+    It's remembered by the expression until it's modified.
+    """
+    version = getattr(expression, "version", None)
+    cached = getattr(expression, "_traversal", None)
+    if version is not None and cached is not None and \
+            cached[0] == version:
+        return cached[1]
+    traversal = Traversal(expression)
+    if version is not None:
+        expression._traversal = version, traversal
+    return traversal
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for autotest.
+"""
+
+import unittest
+
+from testapp import basic
+from testapp.tagging import split_tagger, use_split_tagger
+from quepy.parsing import QuestionTemplate, Token
+from quepy import autotest
+from quepy.autotest import Result, get_examples, match_examples, \
+    template_timings
+
+
+class WhoIs(QuestionTemplate):
+    """
+    Ex: "Who is Pep?"
+        "Who is Tito?"
+    """
+    regex = Token(u"Who") + Token(u"is") + Token(u"Pep")
+
+
+class NoExamples(QuestionTemplate):
+    regex = Token(u"Pep")
+
+
+class FakeParsing(object):
+    WhoIs = WhoIs
+
+
+class OtherParsing(object):
+    NoExamples = NoExamples
+
+
+class FakeModule(object):
+    who_is = WhoIs
+    no_examples = NoExamples
+    question_template = QuestionTemplate
+    something = 42
+
+
+class TestAutotest(unittest.TestCase):
+    def test_get_examples(self):
+        module = FakeModule()
+        self.assertEqual(get_examples(module),
+                         {u"WhoIs": [u"Who is Pep?", u"Who is Tito?"]})
+
+    def test_match_examples(self):
+        templates = {u"UserData": basic.UserData()}
+        items = [(u"UserData", split_tagger(u"user data")),
+                 (u"UserData", split_tagger(u"user")),
+                 (u"UserData", split_tagger(u"user data data"))]
+        results = match_examples(templates, items)
+        self.assertEqual([ok for ok, _ in results], [True, False, False])
+
+    def test_run(self):
+        use_split_tagger(self)
+        self.addCleanup(autotest._templates.clear)
+        expected = [(u"MatchAny", u"something something", True),
+                    (u"UserData", u"user data", True)]
+        for jobs in (1, 2):
+            results = autotest.run("testapp", jobs=jobs, chunksize=1)
+            self.assertEqual([(x.template, x.text, x.ok) for x in results],
+                             expected)
+            self.assertEqual(results[1].words, split_tagger(u"user data"))
+
+    def test_templates_by_app(self):
+        self.addCleanup(autotest._templates.clear)
+        templates = autotest._get_templates(u"fake", FakeParsing())
+        self.assertEqual(templates.keys(), [u"WhoIs"])
+        self.assertEqual(autotest._get_templates(u"other", OtherParsing()), {})
+        self.assertIs(autotest._get_templates(u"fake"), templates)
+
+    def test_template_timings(self):
+        results = [Result(u"A", u"a", [], True, 1.0),
+                   Result(u"B", u"b", [], True, 0.5),
+                   Result(u"B", u"b b", [], False, 1.0)]
+        self.assertEqual(template_timings(results),
+                         [(u"B", 2, 1.5), (u"A", 1, 1.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
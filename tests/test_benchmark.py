@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the benchmarks.
+"""
+
+import json
+import unittest
+
+import quepy
+from quepy.random_expression import random_large_expression
+from quepy.benchmark import percentile, summarize, bench_app, \
+    bench_generators
+from testapp.tagging import use_split_tagger
+
+
+class TestSummary(unittest.TestCase):
+    def test_percentile(self):
+        samples = range(1, 101)
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile(samples, 100), 100)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertEqual(percentile([], 90), None)
+
+    def test_summarize(self):
+        summary = summarize([0.001, 0.003, 0.002])
+        self.assertEqual(summary[u"count"], 3)
+        self.assertAlmostEqual(summary[u"mean"], 2.0)
+        self.assertAlmostEqual(summary[u"p50"], 2.0)
+        self.assertAlmostEqual(summary[u"max"], 3.0)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        use_split_tagger(self)
+
+    def test_bench_app(self):
+        app = quepy.install("testapp")
+        result = bench_app(app, [u"user data", u"something"], repeat=2)
+        self.assertEqual(result[u"questions"], 4)
+        self.assertEqual(result[u"stages"][u"tagging"][u"count"], 4)
+        self.assertIn(u"generation:mql", result[u"stages"])
+        self.assertEqual(result[u"rules"][u"UserData"][u"count"], 4)
+        json.dumps(result)
+
+    def test_bench_generators(self):
+        result = bench_generators(sizes=(5, 50), count=3)
+        self.assertEqual(sorted(result), [u"dot", u"mql", u"sparql"])
+        self.assertEqual(result[u"dot"][u"50"][u"count"], 3)
+        self.assertGreaterEqual(result[u"dot"][u"50"][u"nodes"], 50)
+        self.assertEqual(bench_generators(sizes=(5,), count=3)[u"sparql"]
+                         [u"5"][u"nodes"], result[u"sparql"][u"5"][u"nodes"])
+
+    def test_random_large_expression(self):
+        self.assertGreaterEqual(len(random_large_expression(300)), 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
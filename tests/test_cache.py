@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from quepy.cache import LRUCache, DiskCache, atomic_write
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(2)
+        self.assertEqual(cache.get(u"a"), None)
+        cache.set(u"a", 1)
+        self.assertEqual(cache.get(u"a"), 1)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_discards_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set(u"a", 1)
+        cache.set(u"b", 2)
+        cache.get(u"a")
+        cache.set(u"c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(u"b"), None)
+        self.assertEqual(cache.get(u"a"), 1)
+        self.assertEqual(cache.get(u"c"), 3)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(2, ttl=10, clock=clock)
+        cache.set(u"a", 1)
+        clock.now = 9
+        self.assertEqual(cache.get(u"a"), 1)
+        clock.now = 10
+        self.assertEqual(cache.get(u"a"), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        cache = LRUCache(5)
+        cache.set(u"a", 1)
+        cache.get(u"a")
+        cache.get(u"b")
+        self.assertEqual(cache.stats(), {u"hits": 1, u"misses": 1,
+                                         u"size": 1, u"maxsize": 5})
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError, LRUCache, 0)
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, u"cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_get_set(self):
+        cache = DiskCache(self.path)
+        self.assertEqual(cache.get(u"a"), None)
+        cache.set(u"a", [u"b", 1])
+        self.assertEqual(cache.get(u"a"), [u"b", 1])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_save(self):
+        cache = DiskCache(self.path, u"v1")
+        cache.set(u"á", [[u"b", None]])
+        cache.save()
+        self.assertEqual(DiskCache(self.path, u"v1").get(u"á"),
+                         [[u"b", None]])
+
+    def test_other_version(self):
+        cache = DiskCache(self.path, u"v1")
+        cache.set(u"a", 1)
+        cache.save()
+        cache = DiskCache(self.path, u"v2")
+        self.assertEqual(cache.get(u"a"), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_file(self):
+        with open(self.path, "w") as filehandler:
+            filehandler.write("{")
+        self.assertEqual(len(DiskCache(self.path)), 0)
+
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, u"file")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write(self):
+        atomic_write(self.path, "a")
+        atomic_write(self.path, "b\x00")
+        with open(self.path, "rb") as filehandler:
+            self.assertEqual(filehandler.read(), "b\x00")
+        self.assertEqual(os.listdir(self.folder), [u"file"])
+
+    def test_failed_write_is_removed(self):
+        atomic_write(self.path, "a")
+        self.assertRaises(TypeError, atomic_write, self.path, None)
+        self.assertEqual(os.listdir(self.folder), [u"file"])
+        with open(self.path, "rb") as filehandler:
+            self.assertEqual(filehandler.read(), "a")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the columnar sentences.
+"""
+
+import unittest
+from quepy.columnar import Vocabulary, ColumnarSentence, UNKNOWN
+from quepy.tagger import Word
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_add(self):
+        vocabulary = Vocabulary([u"who", u"be"])
+        self.assertEqual(vocabulary.add(u"be"), 1)
+        self.assertEqual(vocabulary.add(u"NN"), 2)
+        self.assertEqual(len(vocabulary), 3)
+        self.assertEqual(vocabulary.strings, [u"who", u"be", u"NN"])
+
+    def test_get(self):
+        vocabulary = Vocabulary([u"who"])
+        self.assertEqual(vocabulary.get(u"who"), 0)
+        self.assertEqual(vocabulary.get(u"what"), UNKNOWN)
+        self.assertNotIn(u"what", vocabulary)
+
+
+class TestColumnarSentence(unittest.TestCase):
+    def setUp(self):
+        self.vocabulary = Vocabulary([u"who", u"be", u"NNP"])
+        self.words = [Word(u"Who", u"who", u"WP"),
+                      Word(u"is", u"be", u"VBZ"),
+                      Word(u"Pep", u"pep", u"NNP")]
+
+    def test_columns(self):
+        sentence = ColumnarSentence(self.words, self.vocabulary)
+        self.assertEqual(list(sentence), self.words)
+        self.assertEqual(list(sentence.token_ids), [UNKNOWN] * 3)
+        self.assertEqual(list(sentence.lemma_ids), [0, 1, UNKNOWN])
+        self.assertEqual(list(sentence.pos_ids), [UNKNOWN, UNKNOWN, 2])
+        self.assertEqual(list(sentence.rows())[1], (UNKNOWN, 1, UNKNOWN))
+        self.assertEqual(sentence.tokens, u"Who is Pep")
+
+    def test_is_current(self):
+        sentence = ColumnarSentence(self.words, self.vocabulary)
+        self.assertTrue(sentence.is_current(self.vocabulary))
+        self.vocabulary.add(u"Pep")
+        self.assertFalse(sentence.is_current(self.vocabulary))
+        self.assertFalse(sentence.is_current(Vocabulary()))
+
+
+if __name__ == "__main__":
+    unittest.main()
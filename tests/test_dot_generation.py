@@ -13,8 +13,9 @@ import subprocess
 from random_expression import random_expression
 from random import seed
 from quepy.dot_generation import expression_to_dot
+from quepy.expression import Expression
 from quepy.dsl import FixedRelation, FixedType, \
-    FixedDataRelation
+    FixedDataRelation, HasKeyword, IsRelatedTo
 
 
 def gen_datarel(rel, data):
@@ -60,6 +61,27 @@ class TestDotGeneration(unittest.TestCase):
         e += gen_datarel("tµŧurułej€", "←ðßðæßđæßæđßŋŋæ @~~·ŋŋ·¶·ŋ“¶¬@@")
         self.assertRaises(ValueError, expression_to_dot, e)
 
+    def test_dot_is_deterministic(self):
+        seed("no hay dos sin tres")
+        for _ in xrange(50):
+            expression = random_expression()
+            _, first = expression_to_dot(expression)
+            _, second = expression_to_dot(expression)
+            self.assertEqual(first, second)
+
+    def test_keyword_blanks(self):
+        e = HasKeyword(u"pep") + HasKeyword(u"guardiola")
+        _, s = expression_to_dot(e)
+        self.assertIn(u"blank0 [shape=none", s)
+        self.assertIn(u"blank1 [shape=none", s)
+
+    def test_is_related_to(self):
+        e = Expression()
+        e.add_data(IsRelatedTo, u"pep")
+        _, s = expression_to_dot(e)
+        self.assertIn(u'[label=""]', s)
+        self.assertNotIn(u"IsRelatedTo", s)
+
     def test_dot_stress(self):
         seed("I have come here to chew bubblegum and kick ass... "
              "and I'm all out of bubblegum.")
@@ -27,6 +27,21 @@ class TestDSL(unittest.TestCase):
 
         self.assertIn(u"uranium:blowtorch", relations)
 
+    def test_fixed_relation_doesnt_modify_destination(self):
+
+        class MyFixedRelation(FixedRelation):
+            relation = u"uranium:blowtorch"
+            reverse = True
+
+        destination = Expression()
+        destination.add_data(u"rdf:type", u"uranium")
+        MyFixedRelation(destination)
+        MyFixedRelation(destination, reverse=False)
+
+        edges = list(destination.iter_edges(destination.get_head()))
+        self.assertEqual(edges, [(u"rdf:type", u"uranium")])
+        self.assertEqual(len(destination), 1)
+
     def test_fixed_type(self):
 
         class MyFixedType(FixedType):
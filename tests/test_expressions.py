@@ -12,8 +12,10 @@
 Tests for expressions.
 """
 
+import random
 import unittest
-from quepy.expression import Expression, isnode
+from copy import copy
+from quepy.expression import Expression, CompactExpression, isnode
 
 
 def make_canonical_expression(e):
@@ -94,6 +96,29 @@ class ExpressionTests(object):
         a = self.e + other
         self.assertFalse(a is other or self.e is other or a is self.e)
 
+    def test_plus_doesnt_modify_operands(self):
+        other = Expression()
+        other.decapitate("blabla")
+        before = make_canonical_expression(self.e)
+        a = self.e + other
+        after = make_canonical_expression(a)
+        a.add_data("foo", "bar")
+        a.decapitate("baz")
+        self.e.add_data("foo", "qux")
+        self.assertEqual(make_canonical_expression(other),
+                         (("blabla", ()),))
+        self.assertEqual(make_canonical_expression(self.e),
+                         tuple(sorted(before + (("foo", "qux"),))))
+        expected = tuple(sorted(after + (("foo", "bar"),)))
+        self.assertEqual(make_canonical_expression(a), (("baz", expected),))
+
+    def test_copy_keeps_attributes(self):
+        self.e.rule_used = "Rule"
+        new = copy(self.e)
+        self.assertEqual(new.rule_used, "Rule")
+        self.assertEqual(make_canonical_expression(new),
+                         make_canonical_expression(self.e))
+
     def test_plus_is_conmutative(self):
         other = Expression()
         other.decapitate("blabla")
@@ -150,6 +175,66 @@ class TestExpression4(unittest.TestCase, ExpressionTests):
             self.e += other
 
 
+class TestCompactExpression1(unittest.TestCase, ExpressionTests):
+    def setUp(self):
+        self.e = CompactExpression()
+
+
+class TestCompactExpression2(unittest.TestCase, ExpressionTests):
+    def setUp(self):
+        self.e = CompactExpression()
+        self.e.add_data(123, "456")
+        other = CompactExpression()
+        other.add_data(0, "1")
+        other.add_data(2, "3")
+        other.decapitate("iuju")
+        for _ in xrange(5):
+            self.e.decapitate("nouu")
+            self.e += other
+
+
+def random_expressions(cls, depth=0):
+    x = random.random()
+    if depth > 3 or x < 0.2:
+        e = cls()
+        e.add_data(random.choice(u"ab"), random.choice(u"xyz"))
+        return e
+    e = random_expressions(cls, depth + 1)
+    if x < 0.5:
+        e.decapitate(random.choice(u"cd"), random.random() < 0.3)
+    elif x < 0.8:
+        e = e + random_expressions(cls, depth + 1)
+    else:
+        e += random_expressions(cls, depth + 1)
+    return e
+
+
+class TestCompactSameAsExpression(unittest.TestCase):
+    def test_random_expressions(self):
+        for n in xrange(200):
+            random.seed(n)
+            expression = random_expressions(Expression)
+            random.seed(n)
+            compact = random_expressions(CompactExpression)
+            self.assertEqual(len(compact), len(expression))
+            self.assertEqual(make_canonical_expression(compact),
+                             make_canonical_expression(expression))
+            converted = CompactExpression.from_expression(expression)
+            self.assertEqual(make_canonical_expression(converted),
+                             make_canonical_expression(expression))
+
+    def test_mixed_merge(self):
+        a = CompactExpression()
+        a.add_data(u"a", u"x")
+        b = Expression()
+        b.decapitate(u"c")
+        b.add_data(u"b", u"y")
+        c = b + a
+        a += b
+        self.assertEqual(make_canonical_expression(a),
+                         make_canonical_expression(c))
+
+
 class CanonEqualTest(object):
     def test_are_the_same(self):
         a = make_canonical_expression(self.a)
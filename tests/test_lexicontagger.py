@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for lexicontagger.
+"""
+
+import os
+import tempfile
+import unittest
+from quepy.tagger import Word, FunctionBackend
+from quepy.lexicontagger import LexiconBackend, build_lexicon, \
+    save_lexicon, load_lexicon
+
+
+def fake_tagger(string):
+    return [Word(x, x.lower(), u"NNP" if x[0].isupper() else u"VBZ")
+            for x in string.split()]
+
+
+class TestLexiconTagger(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def fallback(string):
+            self.calls.append(string)
+            return fake_tagger(string)
+
+        lexicon = {u"Who": (u"WP", u"who"), u"manages": (u"VBZ", u"manage"),
+                   u"Monaco": (u"NNP", u"monaco"), u"?": (u".", u"?")}
+        self.backend = LexiconBackend(lexicon, FunctionBackend(fallback))
+
+    def test_known_tokens(self):
+        words = self.backend.tag(u"Who manages Monaco?")
+        self.assertEqual(self.calls, [])
+        self.assertEqual([(x.token, x.lemma, x.pos) for x in words],
+                         [(u"Who", u"who", u"WP"),
+                          (u"manages", u"manage", u"VBZ"),
+                          (u"Monaco", u"monaco", u"NNP"),
+                          (u"?", u"?", u".")])
+
+    def test_unknown_tokens(self):
+        self.backend.tag(u"Who manages Porto")
+        self.assertEqual(self.calls, [u"Who manages Porto"])
+
+    def test_tag_many_batches_fallback(self):
+        batches = []
+
+        class Fallback(FunctionBackend):
+            def tag_many(self, strings):
+                batches.append(strings)
+                return [fake_tagger(x) for x in strings]
+
+        backend = LexiconBackend(self.backend.lexicon, Fallback(fake_tagger))
+        result = backend.tag_many([u"Who manages Porto", u"Who manages",
+                                   u"Who is Pep"])
+        self.assertEqual(batches, [[u"Who manages Porto", u"Who is Pep"]])
+        self.assertEqual([len(words) for words in result], [3, 2, 3])
+        self.assertEqual(result[1][1].lemma, u"manage")
+
+    def test_build_lexicon(self):
+        questions = [u"Who manages Porto", u"Who is Pep", u"Who manages"]
+        lexicon = build_lexicon(questions, FunctionBackend(fake_tagger))
+        self.assertEqual(lexicon[u"Who"], (u"NNP", u"who"))
+        self.assertEqual(lexicon[u"manages"], (u"VBZ", u"manages"))
+        self.assertEqual(len(lexicon), 5)
+
+    def test_version(self):
+        version = self.backend.version()
+        self.backend.lexicon[u"Porto"] = (u"NNP", u"porto")
+        self.assertNotEqual(self.backend.version(), version)
+
+    def test_save_load(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            save_lexicon(self.backend.lexicon, path)
+            self.assertEqual(load_lexicon(path), self.backend.lexicon)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the compiled matcher.
+"""
+
+import random
+import unittest
+import refo
+from refo import Star, Plus, Question, Any, Group, Literal, Predicate
+from refo.patterns import Pattern
+from quepy.parsing import Lemma, Pos, Token, Particle
+from quepy.matcher import Program, UnionProgram
+from quepy.parsing import _RefoProgram
+from quepy.tagger import Word
+from quepy.columnar import Vocabulary, ColumnarSentence
+
+_EOL = None
+
+
+class Thing(Particle):
+    regex = Plus(Pos(u"NN"))
+
+
+def random_pattern(depth=0):
+    x = random.random()
+    if depth > 3 or x < 0.3:
+        return random.choice([Lemma(u"a"), Lemma(u"b"), Pos(u"NN"),
+                              Token(u"c"), Any()])
+    x = random.random()
+    sub = random_pattern(depth + 1)
+    greedy = random.random() < 0.7
+    if x < 0.25:
+        return sub + random_pattern(depth + 1)
+    elif x < 0.4:
+        return sub | random_pattern(depth + 1)
+    elif x < 0.5:
+        return Star(sub, greedy=greedy)
+    elif x < 0.6:
+        return Plus(sub, greedy=greedy)
+    elif x < 0.7:
+        return Question(sub, greedy=greedy)
+    elif x < 0.8:
+        return sub * (random.randint(0, 2), random.randint(2, 3))
+    elif x < 0.9:
+        return Group(sub, random.choice(u"xyz"))
+    return Thing() + sub
+
+
+def random_words():
+    words = []
+    for _ in xrange(random.randint(0, 6)):
+        lemma = random.choice(u"abc")
+        pos = random.choice([u"NN", u"DT"])
+        words.append(Word(random.choice(u"abc"), lemma, pos))
+    return words
+
+
+def refo_state(pattern, words):
+    match = refo.match(pattern + Literal(_EOL), words + [_EOL])
+    if match is None:
+        return None
+    return match.state
+
+
+class TestProgram(unittest.TestCase):
+    def test_match(self):
+        program = Program(Lemma(u"who") + Thing())
+        words = [Word(u"Who", u"who", u"WP"), Word(u"Pep", u"pep", u"NN")]
+        match = program.match(words)
+        self.assertEqual(match.span(), (0, 3))
+        self.assertEqual(match[program.pattern.xs[1]], (1, 2))
+
+    def test_no_match(self):
+        program = Program(Lemma(u"who") + Thing())
+        words = [Word(u"Who", u"who", u"WP")]
+        self.assertEqual(program.match(words), None)
+
+    def test_generic_predicate(self):
+        program = Program(Predicate(lambda x: x is not _EOL and
+                                    x.token.isupper()))
+        self.assertNotEqual(program.match([Word(u"PEP")]), None)
+        self.assertEqual(program.match([Word(u"pep")]), None)
+
+    def test_unknown_pattern(self):
+        class Unknown(Pattern):
+            pass
+
+        self.assertRaises(TypeError, Program, Unknown())
+
+    def test_same_as_refo(self):
+        random.seed("el que no salta es un ingles")
+        for _ in xrange(300):
+            pattern = random_pattern()
+            program = Program(pattern)
+            for _ in xrange(5):
+                words = random_words()
+                match = program.match(words)
+                expected = refo_state(pattern, words)
+                if expected is None:
+                    self.assertEqual(match, None)
+                else:
+                    self.assertEqual(match.state, expected)
+
+
+class TestUnionProgram(unittest.TestCase):
+    def test_same_as_programs(self):
+        random.seed("muchachos, ahora nos volvimo a ilusionar")
+        for _ in xrange(30):
+            programs = [Program(random_pattern()) for _ in xrange(10)]
+            union = UnionProgram(programs)
+            for _ in xrange(10):
+                words = random_words()
+                expected = []
+                for n, program in enumerate(programs):
+                    match = program.match(words)
+                    if match is not None:
+                        expected.append((n, match.state))
+                result = [(n, m.state) for n, m in union.match(words)]
+                self.assertEqual(result, expected)
+
+    def test_fallback_programs(self):
+        programs = [_RefoProgram(Lemma(u"a")), Program(Star(Any()))]
+        union = UnionProgram(programs)
+        words = [Word(u"a", u"a", u"NN")]
+        self.assertEqual([n for n, _ in union.match(words)], [0, 1])
+        self.assertEqual([n for n, _ in union.match([])], [1])
+
+
+class TestColumnarMatching(unittest.TestCase):
+    def test_same_as_words(self):
+        random.seed("y al inglaterra le toca la cancion")
+        vocabulary = Vocabulary()
+        programs = [Program(random_pattern()) for _ in xrange(50)]
+        union = UnionProgram(programs)
+        for program in programs:
+            program.column_code(vocabulary)
+        union.column_code(vocabulary)
+        for _ in xrange(50):
+            words = random_words()
+            sentence = ColumnarSentence(words, vocabulary)
+            for program in programs:
+                match = program.match(words)
+                result = program.match(sentence)
+                if match is None:
+                    self.assertEqual(result, None)
+                else:
+                    self.assertEqual(result.state, match.state)
+            self.assertEqual([(n, m.state) for n, m in union.match(sentence)],
+                             [(n, m.state) for n, m in union.match(words)])
+
+    def test_outdated_sentence(self):
+        vocabulary = Vocabulary()
+        words = [Word(u"a", u"a", u"NN")]
+        sentence = ColumnarSentence(words, vocabulary)
+        # Adds "a" to the vocabulary after the sentence was built
+        program = Program(Lemma(u"a"))
+        self.assertNotEqual(program.match(sentence), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
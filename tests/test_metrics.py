@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for metrics.
+"""
+
+import unittest
+
+from quepy import metrics
+from quepy.cache import LRUCache
+from quepy.metrics import Collector, MemoryCollector
+from testapp.tagging import install
+
+
+class TestRegistry(unittest.TestCase):
+    def test_register(self):
+        collector = metrics.register_collector(MemoryCollector)
+        try:
+            self.assertTrue(metrics.collecting())
+            self.assertIs(metrics.register_collector(collector), collector)
+            metrics.increment(u"a", 2, {u"x": u"y"})
+            metrics.timing(u"b", 0.5)
+            metrics.timing(u"b", 0.25)
+        finally:
+            metrics.unregister_collector(collector)
+        self.assertFalse(metrics.collecting())
+        metrics.increment(u"a")
+        self.assertEqual(collector.counters, {(u"a", ((u"x", u"y"),)): 2})
+        self.assertEqual(collector.timings, {(u"b", ()): (2, 0.75)})
+
+    def test_register_string(self):
+        spec = u"quepy.metrics:MemoryCollector"
+        collector = metrics.register_collector(spec)
+        self.assertIs(metrics.register_collector(spec), collector)
+        self.assertEqual(metrics._collectors, [collector])
+        metrics.unregister_collector(spec)
+        self.assertFalse(metrics.collecting())
+
+    def test_register_class_once(self):
+        collector = metrics.register_collector(MemoryCollector)
+        try:
+            self.assertIs(metrics.register_collector(MemoryCollector),
+                          collector)
+            self.assertIs(metrics.register_collector(
+                u"quepy.metrics:MemoryCollector"), collector)
+            self.assertEqual(metrics._collectors, [collector])
+        finally:
+            metrics.unregister_collector(u"quepy.metrics:MemoryCollector")
+        self.assertFalse(metrics.collecting())
+
+    def test_invalid_collector(self):
+        self.assertRaises(ValueError, metrics.register_collector, object())
+        self.assertRaises(ValueError, metrics.register_collector, u"nope")
+
+    def test_base_collector_ignores_everything(self):
+        collector = Collector()
+        collector.timing(u"a", 1.0)
+        collector.increment(u"a")
+
+
+class TestAppMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = install(LRUCache())
+        self.collector = metrics.register_collector(MemoryCollector())
+
+    def tearDown(self):
+        metrics.unregister_collector(self.collector)
+
+    def test_get_query(self):
+        self.app.get_query(u"user data")
+        self.app.get_query(u"user data")
+        counters = self.collector.counters
+        timings = self.collector.timings
+        self.assertEqual(counters[u"tagger_cache_misses", ()], 1)
+        self.assertEqual(counters[u"tagger_cache_hits", ()], 1)
+        self.assertEqual(counters[u"rules_tried", ()], 6)
+        self.assertEqual(counters[u"rules_matched", ()], 2)
+        self.assertEqual(timings[u"tagging", ()][0], 2)
+        self.assertEqual(timings[u"matching", ()][0], 2)
+        template = ((u"template", u"UserData"),)
+        self.assertEqual(timings[u"template_match", template][0], 2)
+        self.assertEqual(timings[u"interpretation", template][0], 2)
+        language = ((u"language", u"sparql"),)
+        self.assertEqual(timings[u"generation", language][0], 2)
+
+    def test_union_matcher(self):
+        self.app.union_matcher = True
+        self.app.get_query(u"user data")
+        counters = self.collector.counters
+        self.assertEqual(counters[u"rules_tried", ()], 3)
+        self.assertEqual(counters[u"rules_matched", ()], 3)
+
+    def test_tag_many(self):
+        self.app.tagger.tag_many([u"user data", u"user data"])
+        self.assertEqual(self.collector.timings[u"tagging_batch", ()][0], 1)
+        self.assertEqual(
+            self.collector.counters[u"tagger_cache_misses", ()], 1)
+
+    def test_query_cache(self):
+        self.app._query_cache = LRUCache()
+        self.app.get_queries_many([u"user data", u"user data", u"other"])
+        list(self.app.get_queries(u"other"))
+        counters = self.collector.counters
+        self.assertEqual(counters[u"query_cache_misses", ()], 2)
+        self.assertEqual(counters[u"query_cache_hits", ()], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,11 +7,62 @@
 # Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
 #          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
 
+import re
 import json
 from random import seed
 import unittest
 from random_expression import random_expression
-from quepy.mql_generation import generate_mql
+from quepy.expression import Expression
+from quepy.mql_generation import generate_mql, choose_start_node, \
+    to_bidirected_graph, post_order_depth_first, paths_from_root
+
+
+def json_mql(e):
+    # MQL generation through json, as it used to be done.
+    start = choose_start_node(e)
+    graph = to_bidirected_graph(e)
+    generated = {}
+    for node in post_order_depth_first(graph, start):
+        d = {}
+        for relation, other in graph[node]:
+            if isinstance(other, int):
+                try:
+                    other = generated[other]
+                except KeyError:
+                    continue
+            d[relation] = other
+        generated[node] = [d]
+
+    mql_query = json.dumps(generated[start], sort_keys=True,
+                            indent=2, separators=(',', ': '))
+    target = paths_from_root(graph, start)[e.get_head()]
+    return target, mql_query
+
+
+def has_brackets(e):
+    for node in e.iter_nodes():
+        for relation, other in e.iter_edges(node):
+            for x in (relation, other):
+                if not isinstance(x, int) and \
+                        re.search(u"[\\[\\]{}]", unicode(x)):
+                    return True
+    return False
+
+
+def tidy(mql):
+    def replacement_function(match):
+        text = match.group(0)
+        if text.startswith("[") and text.endswith("]"):
+            return "[{}]"
+        elif text.startswith("["):
+            return "[{"
+        indent = 0
+        match = re.search("}[ \t]*\n(\s*?)\]", text)
+        if match:
+            indent = len(match.group(1))
+        return " " * indent + "}]"
+    return re.sub("\[\s*{\s*}\s*\]|\[\s+{|[ \t]*}\s+\]",
+                  replacement_function, mql)
 
 
 class TestMqlGeneration(unittest.TestCase):
@@ -64,5 +115,35 @@ class TestMqlGeneration(unittest.TestCase):
             self._valid_mql_query(mql)
             self._valid_target_for_query(target, mql)
 
+    def test_same_as_json(self):
+        seed("playadito vs amanda... 3 focas")
+        for _ in xrange(100):
+            expression = random_expression()
+            target, mql = generate_mql(expression)
+            expected_target, expected = json_mql(expression)
+            self.assertEqual(target, expected_target)
+            self.assertEqual(self._get_json(mql), self._get_json(expected))
+            if not has_brackets(expression):
+                # tidy also changes the brackets inside of the strings
+                self.assertEqual(mql, tidy(expected))
+
+    def test_deep_expression(self):
+        e = Expression()
+        e.add_data(u"name", u"Pep")
+        for _ in xrange(5000):
+            e.decapitate(u"/manager", reverse=True)
+        target, mql = generate_mql(e)
+        self.assertEqual(target, [u"/manager"] * 5000)
+        self.assertEqual(mql.count("[{"), 5001)
+
+    def test_compact(self):
+        seed("playadito vs amanda... 3 focas")
+        for _ in xrange(100):
+            expression = random_expression()
+            target, mql = generate_mql(expression, compact=True)
+            self.assertNotIn("\n", mql)
+            self.assertEqual(self._get_json(mql),
+                             self._get_json(generate_mql(expression)[1]))
+
 if __name__ == "__main__":
     unittest.main()
@@ -12,6 +12,8 @@
 Tests for nltktagger.
 """
 
+import os
+import tempfile
 import unittest
 from quepy import nltktagger
 from quepy.tagger import Word
@@ -28,3 +30,76 @@ class TestNLTKTagger(unittest.TestCase):
     def tests_wrong_input(self):
         self.assertRaises(ValueError, nltktagger.run_nltktagger,
                           "this is not unicode")
+
+    def test_resources_loaded_once(self):
+        pos_tagger, wordnet = nltktagger.load_resources()
+        nltktagger.run_nltktagger(u"who manages Monaco?")
+        self.assertIs(nltktagger.load_resources()[0], pos_tagger)
+
+
+class FakeWordnet(object):
+    def __init__(self):
+        self.calls = []
+
+    def morphy(self, token, pos=None):
+        self.calls.append((token, pos))
+        if token == u"goals":
+            return "goal"
+        return None
+
+
+class TestLemmatize(unittest.TestCase):
+    def setUp(self):
+        self.old_lemmas = nltktagger._lemmas
+        nltktagger._lemmas = {}
+        self.wordnet = FakeWordnet()
+
+    def tearDown(self):
+        nltktagger._lemmas = self.old_lemmas
+
+    def test_lemmas_remembered(self):
+        for _ in xrange(3):
+            lemma = nltktagger.lemmatize(u"goals", "n", self.wordnet)
+            self.assertEqual(lemma, u"goal")
+            self.assertIsInstance(lemma, unicode)
+        self.assertEqual(self.wordnet.calls, [(u"goals", "n")])
+
+    def test_unknown_lemma(self):
+        lemma = nltktagger.lemmatize(u"Messi", None, self.wordnet)
+        self.assertEqual(lemma, u"messi")
+
+    def test_save_load(self):
+        nltktagger.lemmatize(u"goals", "n", self.wordnet)
+        nltktagger.lemmatize(u"Messi", None, self.wordnet)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            nltktagger.save_lemma_table(path)
+            saved = nltktagger._lemmas
+            nltktagger._lemmas = {}
+            nltktagger.load_lemma_table(path)
+            self.assertEqual(nltktagger._lemmas, saved)
+        finally:
+            os.remove(path)
+        nltktagger.lemmatize(u"goals", "n", self.wordnet)
+        self.assertEqual(len(self.wordnet.calls), 2)
+
+    def test_save_empty_table(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            nltktagger.save_lemma_table(path)
+            nltktagger.load_lemma_table(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(nltktagger._lemmas, {})
+
+    def test_empty_data_paths_are_the_same(self):
+        old_resources = nltktagger._resources
+        nltktagger._resources = None, u"tagger", u"wordnet"
+        try:
+            for path in ([], None):
+                self.assertEqual(nltktagger.load_resources(path),
+                                 (u"tagger", u"wordnet"))
+        finally:
+            nltktagger._resources = old_resources
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for parallel translation.
+"""
+
+import unittest
+
+from testapp.tagging import install, use_split_tagger
+from quepy.parallel import translate, translate_questions, chunks
+
+
+class TestParallel(unittest.TestCase):
+    def test_chunks(self):
+        self.assertEqual(list(chunks(iter(xrange(7)), 3)),
+                         [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_translate_questions(self):
+        app = install()
+        questions = [u"user data", u"something"]
+        records = translate_questions(app, questions)
+        self.assertEqual(len(records), 2)
+        for question, record in zip(questions, records):
+            target, query, userdata = app.get_query(question)
+            self.assertEqual(record, (question, target, query, userdata))
+
+    def test_translate_many_processes(self):
+        use_split_tagger(self)
+        app = install()
+        questions = [u"user data", u"something", u"user  data", u"other"]
+        records = list(translate("testapp", questions, jobs=2, chunksize=1))
+        self.assertEqual(records, translate_questions(app, questions))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,8 +12,11 @@
 Tests for Regex module.
 """
 
+import refo
 import unittest
-from quepy.parsing import QuestionTemplate, Particle, Lemma
+from refo import Plus, Group
+from quepy.dsl import HasKeyword
+from quepy.parsing import QuestionTemplate, Particle, Match, Lemma, Pos
 from quepy.tagger import Word
 
 
@@ -124,5 +127,99 @@ class TestParticle(unittest.TestCase):
         self.assertRaises(AttributeError, lambda: match.personasset.another)
 
 
+class TestInterpretationMemo(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        calls = self.calls
+
+        class Team(Particle):
+            regex = Plus(Pos(u"NNP"))
+
+            def interpret(self, match):
+                calls.append(match.words.tokens)
+                return HasKeyword(match.words.tokens)
+
+        class ManagerOf(QuestionTemplate):
+            regex = Lemma(u"manager") + Lemma(u"of") + Team()
+
+            def interpret(self, match):
+                return match.team + match.team
+
+        class WhoManages(QuestionTemplate):
+            regex = Lemma(u"manager") + Lemma(u"of") + Team()
+
+            def interpret(self, match):
+                match.team.decapitate(u"foaf:manager")
+                return match.team
+
+        self.rules = [ManagerOf(), WhoManages()]
+        self.words = [Word(u"manager", u"manager", u"NN"),
+                      Word(u"of", u"of", u"IN"),
+                      Word(u"Real", u"real", u"NNP"),
+                      Word(u"Madrid", u"madrid", u"NNP")]
+
+    def test_interpreted_once_per_match(self):
+        expression, _ = self.rules[0].get_interpretation(self.words)
+        self.assertEqual(self.calls, [u"Real Madrid"])
+        self.assertEqual(len(expression), 1)
+
+    def test_interpreted_once_per_question(self):
+        interpretations = {}
+        for rule in self.rules:
+            match = rule.match(self.words)
+            expression, _ = rule.get_match_interpretation(match, self.words,
+                                                          interpretations)
+        self.assertEqual(self.calls, [u"Real Madrid"])
+        # Modifying an interpretation doesn't change the remembered one
+        self.assertEqual(len(expression), 1)
+
+    def test_values_are_copies(self):
+        match = Match(self.rules[0].match(self.words), self.words)
+        self.assertIsInstance(match.team, HasKeyword)
+        self.assertIsNot(match.team, match.team)
+        self.assertEqual(len(self.calls), 1)
+        self.assertRaises(AttributeError, getattr, match, "__deepcopy__")
+
+    def test_wordlists_are_fresh(self):
+        regex = Lemma(u"manager") + Lemma(u"of") + \
+            Group(Plus(Pos(u"NNP")), u"team")
+        match = Match(refo.match(regex, self.words), self.words)
+        match.team.append(Word(u"CF", u"cf", u"NNP"))
+        self.assertEqual(match.team.tokens, u"Real Madrid")
+        self.assertEqual(match.words.tokens, u"manager of Real Madrid")
+
+    def test_composite_values_are_copies(self):
+        class Pair(Particle):
+            regex = Plus(Pos(u"NNP"))
+
+            def interpret(self, match):
+                return HasKeyword(u"a"), [HasKeyword(u"b")]
+
+        regex = Lemma(u"manager") + Lemma(u"of") + Pair()
+        match = Match(refo.match(regex, self.words), self.words)
+        first, others = match.pair
+        first.decapitate(u"foaf:manager")
+        others[0].decapitate(u"foaf:manager")
+        others.append(None)
+        first, others = match.pair
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(others), 1)
+        self.assertEqual(len(others[0]), 1)
+
+    def test_particle_names_dont_collide(self):
+        class Name(Particle):
+            regex = Plus(Pos(u"NNP"))
+
+            def interpret(self, match):
+                return self.name
+
+        interpretations = {}
+        for name in (u"home", u"away"):
+            regex = Lemma(u"manager") + Lemma(u"of") + Name(name)
+            match = Match(refo.match(regex, self.words), self.words,
+                          interpretations=interpretations)
+            self.assertEqual(getattr(match, name), name)
+
+
 if __name__ == "__main__":
     unittest.main()
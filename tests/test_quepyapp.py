@@ -15,6 +15,11 @@ Tests for QuepyApp.
 import unittest
 
 import quepy
+from quepy.cache import LRUCache
+from quepy.tagger import Word, Tagger
+from quepy.dsl import HasKeyword
+from quepy.parsing import QuestionTemplate, Token
+from testapp.tagging import split_tagger
 
 
 class TestQuepyApp(unittest.TestCase):
@@ -39,6 +44,102 @@ class TestQuepyApp(unittest.TestCase):
         target, query, userdata = self.app.get_query(question)
         self.assertEqual(userdata, 42)
 
+    def test_get_matches(self):
+        words = split_tagger(u"user data")
+        matches = self.app.get_matches(words)
+        self.assertEqual([rule.__class__.__name__ for rule, _ in matches],
+                         [u"UserData", u"MatchAny", u"LowMatchAny"])
+        for rule, match in matches:
+            self.assertEqual(match.state, rule.match(words).state)
+
+    def test_union_matcher(self):
+        words = [Word(u"user", u"user", u"NN"), Word(u"data", u"data", u"NN")]
+        expected = [(rule, match.state)
+                    for rule, match in self.app._iter_matches(words)]
+        self.app.union_matcher = True
+        result = [(rule, match.state)
+                  for rule, match in self.app._iter_matches(words)]
+        self.assertEqual(result, expected)
+        self.assertEqual(len(result), 3)
+
+    def test_columnar_matcher(self):
+        words = [Word(u"user", u"user", u"NN"), Word(u"data", u"data", u"NN")]
+        expected = [(rule, match.state)
+                    for rule, match in self.app._iter_matches(words)]
+        self.app.columnar_matcher = True
+        for union in (False, True):
+            self.app.union_matcher = union
+            result = [(rule, match.state)
+                      for rule, match in self.app._iter_matches(words)]
+            self.assertEqual(result, expected)
+        self.assertIn(u"user", self.app._get_vocabulary())
+
+    def test_query_cache(self):
+        calls = []
+
+        def function(string):
+            calls.append(string)
+            return split_tagger(string)
+
+        self.app.tagger = Tagger(function)
+        self.app._query_cache = LRUCache(10)
+        first = list(self.app.get_queries(u"user data"))
+        second = list(self.app.get_queries(u"user  data"))
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+
+        self.app.rules.pop()
+        third = list(self.app.get_queries(u"user data"))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(third), len(first) - 1)
+
+    def test_query_cache_settings(self):
+        from quepy import settings
+        calls = []
+
+        def function(string):
+            calls.append(string)
+            return split_tagger(string)
+
+        self.app.tagger = Tagger(function)
+        self.app._query_cache = LRUCache(10)
+        list(self.app.get_queries(u"user data"))
+        list(self.app.get_queries(u"user data"))
+        self.assertEqual(len(calls), 1)
+        preamble = settings.SPARQL_PREAMBLE
+        try:
+            settings.SPARQL_PREAMBLE = preamble + u" "
+            list(self.app.get_queries(u"user data"))
+        finally:
+            settings.SPARQL_PREAMBLE = preamble
+        self.assertEqual(len(calls), 2)
+
+    def test_query_cache_copies_userdata(self):
+        class Mutable(QuestionTemplate):
+            regex = Token(u"mutable")
+
+            def interpret(self, match):
+                return HasKeyword(u"mutable"), [1]
+
+        self.app.tagger = Tagger(split_tagger)
+        self.app._query_cache = LRUCache(10)
+        self.app.rules.insert(0, Mutable())
+        _, _, userdata = self.app.get_query(u"mutable")
+        userdata.append(2)
+        self.assertEqual(self.app.get_query(u"mutable")[2], [1])
+        result = self.app.get_queries_many([u"mutable", u"mutable"])
+        result[0][0][2].append(2)
+        self.assertEqual(result[1][0][2], [1])
+        self.assertEqual(self.app.get_query(u"mutable")[2], [1])
+
+    def test_get_queries_many(self):
+        self.app.tagger = Tagger(split_tagger)
+        questions = [u"user data", u"something", u"user  data"]
+        result = self.app.get_queries_many(questions)
+        self.assertEqual(len(result), 3)
+        for question, queries in zip(questions, result):
+            self.assertEqual(queries, list(self.app.get_queries(question)))
+
     def test_config_is_saved(self):
         from quepy import settings
         self.assertIn("testapp", settings.SPARQL_PREAMBLE)
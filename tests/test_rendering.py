@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the rendering of dot graphs.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from distutils.spawn import find_executable
+
+from quepy.cache import LRUCache
+from quepy.rendering import render, render_many, _key, ImageCache
+
+_GRAPH = u"digraph G {\nx0 [shape=house];\nx0 -> x1 [label=\"ñ\"];\n}\n"
+_MISSING = "quepy-no-such-program"
+
+
+class TestRenderingCache(unittest.TestCase):
+    def test_cached_image_skips_program(self):
+        cache = LRUCache()
+        cache.set(_key(_GRAPH.encode("utf-8"), "png"), "image")
+        self.assertEqual(render(_GRAPH, "png", _MISSING, cache), "image")
+
+    def test_cache_key_depends_on_format(self):
+        cache = LRUCache()
+        cache.set(_key(_GRAPH.encode("utf-8"), "png"), "image")
+        self.assertRaises(OSError, render, _GRAPH, "svg", _MISSING, cache)
+
+    def test_missing_program(self):
+        self.assertRaises(OSError, render, _GRAPH, "png", _MISSING, None)
+
+    def test_render_many_keeps_order(self):
+        cache = LRUCache()
+        graphs = [u"digraph G {{\nx{}\n}}\n".format(i) for i in xrange(10)]
+        for graph in graphs:
+            cache.set(_key(graph.encode("utf-8"), "svg"), graph)
+        images = render_many(graphs, "svg", 4, _MISSING, cache)
+        self.assertEqual(images, graphs)
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, u"images")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_miss(self):
+        cache = ImageCache(self.path)
+        self.assertEqual(cache.get(_key("x", "png")), None)
+
+    def test_persists(self):
+        key = _key(_GRAPH.encode("utf-8"), "png")
+        ImageCache(self.path).set(key, "\x89PNG\x00")
+        cache = ImageCache(self.path)
+        self.assertEqual(cache.get(key), "\x89PNG\x00")
+        self.assertEqual(cache.get(_key(_GRAPH.encode("utf-8"), "svg")),
+                         None)
+
+    def test_render_skips_program(self):
+        key = _key(_GRAPH.encode("utf-8"), "svg")
+        ImageCache(self.path).set(key, "<svg/>")
+        self.assertEqual(render(_GRAPH, "svg", _MISSING,
+                                ImageCache(self.path)), "<svg/>")
+
+
+@unittest.skipIf(find_executable("dot") is None, "dot is not installed")
+class TestRendering(unittest.TestCase):
+    def test_render_svg(self):
+        cache = LRUCache()
+        image = render(_GRAPH, "svg", cache=cache)
+        self.assertIn("<svg", image)
+        self.assertIs(render(_GRAPH, "svg", cache=cache), image)
+
+    def test_invalid_graph(self):
+        self.assertRaises(ValueError, render, u"digraph {", "png", cache=None)
+
+    def test_render_many(self):
+        graphs = [u"digraph G {{\nx{}\n}}\n".format(i) for i in xrange(5)]
+        images = render_many(graphs, "svg", 3, cache=None)
+        self.assertEqual(images, [render(x, "svg", cache=None)
+                                  for x in graphs])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the rule index.
+"""
+
+import refo
+import unittest
+from refo import Star, Plus, Question, Any, Predicate
+from quepy.parsing import QuestionTemplate, Particle, Lemma, Pos, Token
+from quepy.ruleindex import analyse, RuleIndex
+from quepy.tagger import Word
+
+
+class Person(Particle):
+    regex = Question(Pos(u"DT")) + Plus(Pos(u"NNP"))
+
+
+def make_rule(pattern):
+    class Rule(QuestionTemplate):
+        regex = pattern
+    return Rule()
+
+
+def make_words(string):
+    words = []
+    for x in string.split():
+        token, lemma, pos = x.split(u"|")
+        words.append(Word(token, lemma, pos))
+    return words
+
+
+class TestAnalyse(unittest.TestCase):
+    def test_predicate(self):
+        nullable, first, required = analyse(Lemma(u"who"))
+        self.assertFalse(nullable)
+        self.assertEqual(first, set([(u"lemma", u"who")]))
+        self.assertEqual(required, set([(u"lemma", u"who")]))
+
+    def test_unknown_predicate(self):
+        nullable, first, required = analyse(Predicate(lambda x: True))
+        self.assertFalse(nullable)
+        self.assertEqual(first, None)
+        self.assertEqual(required, set())
+
+    def test_concatenation(self):
+        regex = Question(Pos(u"DT")) + Token(u"who") + Lemma(u"be")
+        nullable, first, required = analyse(regex)
+        self.assertFalse(nullable)
+        self.assertEqual(first, set([(u"pos", u"DT"), (u"token", u"who")]))
+        self.assertEqual(required, set([(u"token", u"who"),
+                                        (u"lemma", u"be")]))
+
+    def test_disjunction(self):
+        regex = (Lemma(u"who") + Lemma(u"be")) | Lemma(u"be")
+        nullable, first, required = analyse(regex)
+        self.assertFalse(nullable)
+        self.assertEqual(first, set([(u"lemma", u"who"), (u"lemma", u"be")]))
+        self.assertEqual(required, set([(u"lemma", u"be")]))
+
+    def test_star_is_nullable(self):
+        nullable, first, required = analyse(Star(Any()))
+        self.assertTrue(nullable)
+        self.assertEqual(first, None)
+        self.assertEqual(required, set())
+
+    def test_particle(self):
+        nullable, first, required = analyse(Lemma(u"who") + Person())
+        self.assertFalse(nullable)
+        self.assertEqual(first, set([(u"lemma", u"who")]))
+        self.assertEqual(required, set([(u"lemma", u"who"),
+                                        (u"pos", u"NNP")]))
+
+
+class TestRuleIndex(unittest.TestCase):
+    def setUp(self):
+        self.who = make_rule(Lemma(u"who") + Lemma(u"be") + Person())
+        self.manager = make_rule(Person() + Lemma(u"manager"))
+        self.anything = make_rule(Star(Any()))
+        self.index = RuleIndex([self.who, self.manager, self.anything])
+
+    def test_candidates(self):
+        words = make_words(u"Who|who|WP is|be|VBZ Pep|pep|NNP")
+        candidates = self.index.candidates(words)
+        self.assertEqual(candidates, [self.who, self.anything])
+
+    def test_candidates_keep_order(self):
+        words = make_words(u"the|the|DT Pep|pep|NNP manager|manager|NN")
+        candidates = self.index.candidates(words)
+        self.assertEqual(candidates, [self.manager, self.anything])
+
+    def test_candidates_missing_required(self):
+        words = make_words(u"Who|who|WP is|be|VBZ")
+        candidates = self.index.candidates(words)
+        self.assertEqual(candidates, [self.anything])
+
+    def test_candidates_empty_question(self):
+        self.assertEqual(self.index.candidates([]), [self.anything])
+
+    def test_discarded_rules_dont_match(self):
+        questions = [u"Who|who|WP is|be|VBZ Pep|pep|NNP",
+                     u"Pep|pep|NNP manager|manager|NN",
+                     u"manager|manager|NN",
+                     u"is|be|VBZ Pep|pep|NNP"]
+        for question in questions:
+            words = make_words(question)
+            candidates = self.index.candidates(words)
+            for rule in self.index.rules:
+                if rule in candidates:
+                    continue
+                self.assertIsNone(refo.match(rule.regex, words))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,9 +11,12 @@ import re
 import unittest
 from random_expression import random_expression
 from random import seed
-from quepy.sparql_generation import expression_to_sparql
+from quepy import settings
+from quepy import sparql_generation
+from quepy.sparql_generation import expression_to_sparql, adapt, triple, \
+    escape, escape_literal, term_prefix, pruned_preamble
 from quepy.dsl import FixedRelation, FixedType, \
-    FixedDataRelation
+    FixedDataRelation, IsRelatedTo
 
 
 def gen_datarel(rel, data):
@@ -98,5 +101,153 @@ class TestSparqlGeneration(unittest.TestCase):
         self.assertRaises(ValueError, expression_to_sparql, e)
 
 
+def plain_escape(string):
+    string = unicode(string)
+    for x in u"\n\r\t\x0b":
+        string = string.replace(x, u"")
+    if not string or any([x for x in string if 0 < ord(x) < 31]) or \
+            string.startswith(":") or string.endswith(":"):
+        raise ValueError()
+    return string
+
+
+class TestEscape(unittest.TestCase):
+    def test_same_as_plain_escape(self):
+        strings = [u"", u":a", u"a:", u"a:b", u"\n", u"a\nb\tc\r\x0bd",
+                   u"\x00", u"\x01", u"\x1e", u"\x1f", u"ñandú", u"?x1"]
+        strings += [unichr(i) + u"a" for i in xrange(64)]
+        for string in strings:
+            for _ in xrange(2):
+                try:
+                    expected = plain_escape(string)
+                except ValueError:
+                    self.assertRaises(ValueError, escape, string)
+                else:
+                    self.assertEqual(escape(string), expected)
+
+    def test_escape_literal(self):
+        self.assertEqual(escape_literal(u"Pep"), u'"Pep"')
+        self.assertEqual(escape_literal(u"Pep"), u'"Pep"')
+        self.assertEqual(escape_literal(u"dbpedia:Pep"), u"dbpedia:Pep")
+        self.assertEqual(escape_literal(3), u"?x3")
+        # Remembering u"Pep" doesn't make "Pep" valid
+        self.assertRaises(ValueError, escape_literal, "Pep")
+
+
+def plain_sparql(e):
+    # Query generation without skeletons
+    xs = []
+    y = 0
+    for node in e.iter_nodes():
+        for relation, dest in e.iter_edges(node):
+            if relation is IsRelatedTo:
+                relation = u"?y{}".format(y)
+                y += 1
+            xs.append(triple(adapt(node), relation, adapt(dest),
+                      indentation=1))
+    head = adapt(e.get_head())
+    return u"{}\nSELECT DISTINCT {} WHERE {{\n{}\n}}\n".format(
+        settings.SPARQL_PREAMBLE, head, u"\n".join(xs))
+
+
+class TestSparqlSkeletons(unittest.TestCase):
+    def setUp(self):
+        self.prune = settings.SPARQL_PRUNE_PREAMBLE
+        settings.SPARQL_PRUNE_PREAMBLE = False
+
+    def tearDown(self):
+        settings.SPARQL_PRUNE_PREAMBLE = self.prune
+
+    def test_same_as_plain_generation(self):
+        seed("sacala dunga dunga dunga")
+        for _ in xrange(100):
+            expression = random_expression()
+            try:
+                expected = plain_sparql(expression)
+            except ValueError:
+                self.assertRaises(ValueError, expression_to_sparql,
+                                  expression)
+                continue
+            for _ in xrange(2):
+                _, s = expression_to_sparql(expression)
+                self.assertEqual(s, expected)
+
+    def test_skeleton_reused(self):
+        a = gen_fixedrelation(IsRelatedTo, gen_datarel(u"foaf:name", u"Pep"))
+        b = gen_fixedrelation(IsRelatedTo, gen_datarel(u"foaf:name", u"Tito"))
+        expression_to_sparql(a)
+        cache = sparql_generation._get_skeleton_cache()
+        hits = cache.hits
+        _, s = expression_to_sparql(b)
+        self.assertEqual(cache.hits, hits + 1)
+        self.assertEqual(s, plain_sparql(b))
+        self.assertIn(u'"Tito"', s)
+        self.assertNotIn(u'"Pep"', s)
+
+    def test_invalid_literal(self):
+        a = gen_datarel(u"foaf:name", u"Pep")
+        b = gen_datarel(u"foaf:name", u"\x01")
+        expression_to_sparql(a)
+        self.assertRaises(ValueError, expression_to_sparql, b)
+
+
+class TestPreamblePruning(unittest.TestCase):
+    preamble = (u"\nPREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>"
+                u"\nprefix foaf: <http://xmlns.com/foaf/0.1/>"
+                u"\nPREFIX dbpedia-owl: <http://dbpedia.org/ontology/>"
+                u"\nPREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n")
+
+    def setUp(self):
+        self.old_preamble = settings.SPARQL_PREAMBLE
+        self.prune = settings.SPARQL_PRUNE_PREAMBLE
+        settings.SPARQL_PREAMBLE = self.preamble
+        settings.SPARQL_PRUNE_PREAMBLE = True
+
+    def tearDown(self):
+        settings.SPARQL_PREAMBLE = self.old_preamble
+        settings.SPARQL_PRUNE_PREAMBLE = self.prune
+
+    def test_term_prefix(self):
+        self.assertEqual(term_prefix(u"foaf:name"), u"foaf")
+        self.assertEqual(term_prefix(u"dbpedia-owl:Club"), u"dbpedia-owl")
+        self.assertEqual(term_prefix(u'"1"^^xsd:int'), u"xsd")
+        self.assertEqual(term_prefix(u'"a:b"@en'), None)
+        self.assertEqual(term_prefix(u"<http://dbpedia.org/>"), None)
+        self.assertEqual(term_prefix(u"?x0"), None)
+
+    def test_only_used_prefixes(self):
+        e = gen_fixedtype(u"dbpedia-owl:SoccerClub")
+        e += gen_datarel(u"foaf:name", u"Real Madrid")
+        _, s = expression_to_sparql(e)
+        self.assertIn(u"PREFIX rdf:", s)
+        self.assertIn(u"prefix foaf:", s)
+        self.assertIn(u"PREFIX dbpedia-owl:", s)
+        self.assertNotIn(u"PREFIX xsd:", s)
+
+    def test_prefixes_of_literals(self):
+        # Same shape, the type is a literal
+        _, s = expression_to_sparql(gen_fixedtype(u"dbpedia-owl:SoccerClub"))
+        self.assertIn(u"PREFIX dbpedia-owl:", s)
+        _, s = expression_to_sparql(gen_fixedtype(u'"1"^^xsd:int'))
+        self.assertNotIn(u"PREFIX dbpedia-owl:", s)
+        self.assertIn(u"PREFIX xsd:", s)
+
+    def test_pruning_disabled(self):
+        settings.SPARQL_PRUNE_PREAMBLE = False
+        _, s = expression_to_sparql(gen_datarel(u"foaf:name", u"Pep"))
+        self.assertTrue(s.startswith(self.preamble))
+
+    def test_many_prefixes_per_line(self):
+        preamble = (u"PREFIX xsd: <http://www.w3.org/2001/XMLSchema#> "
+                    u"PREFIX foaf: <http://xmlns.com/foaf/0.1/>\n"
+                    u"PREFIX rdf: <r#>  prefix owl: <o#>\nPREFIX skos: <s#>\n")
+        self.assertEqual(pruned_preamble(preamble, {u"foaf"}),
+                         u"PREFIX foaf: <http://xmlns.com/foaf/0.1/>\n")
+        self.assertEqual(pruned_preamble(preamble, {u"xsd", u"owl"}),
+                         u"PREFIX xsd: <http://www.w3.org/2001/XMLSchema#> "
+                         u"\nprefix owl: <o#>\n")
+        self.assertEqual(pruned_preamble(u"# none\n", set()), u"# none\n")
+
+
 if __name__ == "__main__":
     unittest.main()
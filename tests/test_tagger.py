@@ -12,8 +12,11 @@
 Tests for tagger.
 """
 
+import pickle
 import unittest
-from quepy import tagger
+from quepy import tagger, settings
+from quepy.cache import LRUCache
+from testapp.tagging import split_tagger, TAGGER
 
 
 class TestTagger(unittest.TestCase):
@@ -44,24 +47,142 @@ class TestTagger(unittest.TestCase):
         self.assertRaises(ValueError, tagger.Word, u"æßđħłłþłłł@æµß",
                           u"ŧłþłßæ#¶ŋħ~#~@", "øĸŋøħþ€ĸłþ€øæ«»¢")
 
-    def test_word_attrib_set(self):
+    def test_word_is_immutable(self):
         word = tagger.Word(u"æßđħłłþłłł@æµß")
-        word.lemma = u"ŧłþłßæ#¶ŋħ~#~@"
-        word.pos = u"øĸŋøħþ€ĸłþ€øæ«»¢"
-
-        self.assertIsInstance(word.token, unicode)
+        self.assertRaises(AttributeError, setattr, word, "lemma",
+                          u"ŧłþłßæ#¶ŋħ~#~@")
+        self.assertRaises(AttributeError, setattr, word, "pos", "NN")
+        self.assertRaises(AttributeError, setattr, word, "other", 1)
+        self.assertRaises(AttributeError, delattr, word, "token")
         self.assertEqual(word.token, u"æßđħłłþłłł@æµß")
-        self.assertIsInstance(word.lemma, unicode)
-        self.assertEqual(word.lemma, u"ŧłþłßæ#¶ŋħ~#~@")
-        self.assertIsInstance(word.pos, unicode)
-        self.assertEqual(word.pos, u"øĸŋøħþ€ĸłþ€øæ«»¢")
+        self.assertEqual(word.lemma, None)
 
-    def test_word_wrong_attrib_set(self):
-        word = tagger.Word(u"æßđħłłþłłł@æµß")
+    def test_word_trusted(self):
+        word = tagger.Word.trusted(u"goals", u"goal", u"NNS")
+        self.assertEqual(word, tagger.Word(u"goals", u"goal", u"NNS"))
+        self.assertEqual(word.prob, None)
+        self.assertFalse(hasattr(word, "__dict__"))
 
-        # Token not unicode
-        self.assertRaises(ValueError, setattr, word, "token", "æßđħłłþłłł@æµß")
-        # Lemma not unicode
-        self.assertRaises(ValueError, setattr, word, "lemma", "ŧłþłßæ#¶ŋħ~#~@")
-        # Pos not unicode
-        self.assertRaises(ValueError, setattr, word, "pos", "øĸŋøħþ€ĸłþ€øæ«»¢")
+    def test_word_hash(self):
+        a = tagger.Word(u"goals", u"goal", u"NNS")
+        b = tagger.Word(u"goals", u"goal", u"NNS")
+        c = tagger.Word(u"goals", u"goals", u"NNS")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertEqual(len(set([a, b, c])), 2)
+
+    def test_word_pickle(self):
+        word = tagger.Word(u"goals", u"goal", u"NNS", 0.5)
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(word, protocol)),
+                             word)
+
+
+class TestTaggerCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def function(string):
+            self.calls.append(string)
+            return [tagger.Word(x, x.lower(), u"NN") for x in string.split()]
+
+        self.tagger = tagger.Tagger(function, LRUCache(10))
+
+    def test_memoises_normalized_string(self):
+        words1 = self.tagger(u"Who manages  Monaco")
+        words2 = self.tagger(u" Who manages Monaco ")
+        self.assertEqual(self.calls, [u"Who manages Monaco"])
+        self.assertEqual([unicode(x) for x in words1],
+                         [unicode(x) for x in words2])
+        self.assertEqual(self.tagger.cache.hits, 1)
+
+    def test_returns_copies(self):
+        words = self.tagger(u"Who manages Monaco")
+        words[0] = tagger.Word(u"corrupted")
+        words = self.tagger(u"Who manages Monaco")
+        self.assertEqual(words[0].lemma, u"who")
+        words[0] = tagger.Word(u"corrupted")
+        words = self.tagger(u"Who manages Monaco")
+        self.assertEqual(words[0].lemma, u"who")
+
+    def test_no_cache(self):
+        self.tagger.cache = None
+        self.tagger(u"Who manages Monaco")
+        self.tagger(u"Who manages Monaco")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_no_cache_tags_raw_string(self):
+        self.tagger.cache = None
+        self.tagger(u" Who manages  Monaco")
+        self.assertEqual(self.calls, [u" Who manages  Monaco"])
+
+    def test_cache_is_opt_in(self):
+        self.assertIsNone(tagger.get_tagger().cache)
+        previous = settings.TAGGER_CACHE_SIZE
+        settings.TAGGER_CACHE_SIZE = 10
+        try:
+            self.assertEqual(tagger.get_tagger().cache.size, 10)
+        finally:
+            settings.TAGGER_CACHE_SIZE = previous
+
+    def test_wrong_encoding(self):
+        self.assertRaises(ValueError, self.tagger, "not unicode")
+
+    def test_tag_many(self):
+        batches = []
+
+        def batch_function(strings):
+            batches.append(strings)
+            return [self.tagger.function(x) for x in strings]
+
+        self.tagger.batch_function = batch_function
+        self.tagger(u"Who manages Monaco")
+        result = self.tagger.tag_many([u"Who is Pep", u"Who manages Monaco",
+                                       u"Who  is Pep"])
+        self.assertEqual(batches, [[u"Who is Pep"]])
+        self.assertEqual([[x.token for x in words] for words in result],
+                         [[u"Who", u"is", u"Pep"],
+                          [u"Who", u"manages", u"Monaco"],
+                          [u"Who", u"is", u"Pep"]])
+        self.assertIsNot(result[0][0], result[2][0])
+
+
+class TestBackends(unittest.TestCase):
+    def test_function_spec(self):
+        backend = tagger.get_backend(TAGGER)
+        self.assertIsInstance(backend, tagger.FunctionBackend)
+        self.assertEqual(len(backend.tag(u"a b")), 2)
+
+    def test_register_backend(self):
+        tagger.register_backend(u"split", split_tagger)
+        backend = tagger.get_backend(u"split")
+        self.assertEqual(backend.tag_many([u"a b", u"c"])[1][0].token, u"c")
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, tagger.get_backend, u"nonexistent")
+
+    def test_warmup_shared_backend(self):
+        class Backend(tagger.TaggerBackend):
+            warmed = False
+
+            def warmup(self):
+                self.warmed = True
+
+        tagger.register_backend(u"warm", Backend)
+        previous = settings.TAGGER
+        settings.TAGGER = u"warm"
+        try:
+            tagger.warmup()
+            self.assertTrue(tagger.get_backend().warmed)
+        finally:
+            settings.TAGGER = previous
+
+    def test_version(self):
+        backend = tagger.get_backend(TAGGER)
+        self.assertEqual(backend.version(), u"testapp.tagging.split_tagger")
+        self.assertNotEqual(backend.version(),
+                            tagger.get_backend(u"nltk").version())
+
+    def test_default_backend(self):
+        from quepy.nltktagger import NLTKBackend
+        self.assertIsInstance(tagger.get_backend(), NLTKBackend)
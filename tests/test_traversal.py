@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tests for the traversal of expressions.
+"""
+
+import unittest
+from quepy.expression import Expression, CompactExpression
+from quepy.traversal import get_traversal, breadth_first
+
+
+def make_expression(cls):
+    # x0 <-manager- x1 -type-> "Team"; x2 -plays-> x0
+    e = cls()
+    e.add_data(u"name", u"Pep")
+    e.decapitate(u"manager")
+    other = cls()
+    other.add_data(u"type", u"Team")
+    e += other
+    e.decapitate(u"plays", reverse=True)
+    return e
+
+
+class TestTraversal(unittest.TestCase):
+    def setUp(self):
+        self.e = make_expression(Expression)
+
+    def test_adjacency(self):
+        traversal = get_traversal(self.e)
+        self.assertEqual(traversal.edges,
+                         [(0, u"name", u"Pep"), (1, u"manager", 0),
+                          (1, u"type", u"Team"), (1, u"plays", 2)])
+        self.assertEqual(traversal.forward[1], [(u"manager", 0),
+                                                (u"type", u"Team"),
+                                                (u"plays", 2)])
+        self.assertEqual(traversal.reverse[0], [(u"manager", 1)])
+        self.assertEqual(traversal.neighbours[0], [(u"name", u"Pep", False),
+                                                   (u"manager", 1, True)])
+        self.assertEqual(len(traversal), 3)
+
+    def test_adjacency_is_lazy(self):
+        traversal = get_traversal(self.e)
+        self.assertIsNone(traversal._neighbours)
+        neighbours = traversal.neighbours
+        self.assertIs(traversal.neighbours, neighbours)
+        self.assertIsNone(traversal._forward)
+        self.assertIsNone(traversal._reverse)
+
+    def test_tree(self):
+        tree = get_traversal(self.e).tree(2)
+        self.assertEqual(tree.order, [2, 1, 0])
+        self.assertEqual(tree.post_order(), [0, 1, 2])
+        self.assertEqual(tree.parents[0], (1, u"manager", False))
+        self.assertEqual(tree.path(0), [(u"plays", True),
+                                        (u"manager", False)])
+        self.assertEqual(tree.path(2), [])
+
+    def test_breadth_first_pairs(self):
+        graph = {0: [(u"a", 1), (u"b", u"data")], 1: [(u"!a", 0), (u"c", 2)],
+                 2: [(u"!c", 1)]}
+        order, parents = breadth_first(graph, 2)
+        self.assertEqual(order, [2, 1, 0])
+        self.assertEqual(parents, {2: None, 1: (2, u"!c"), 0: (1, u"!a")})
+
+    def test_cached_until_modified(self):
+        traversal = get_traversal(self.e)
+        self.assertIs(get_traversal(self.e), traversal)
+        self.e.add_data(u"foo", u"bar")
+        self.assertIsNot(get_traversal(self.e), traversal)
+        self.assertIn((2, u"foo", u"bar"), get_traversal(self.e).edges)
+
+    def test_copies(self):
+        traversal = get_traversal(self.e)
+        new = self.e + Expression()
+        self.assertEqual(get_traversal(new).edges, traversal.edges)
+        new.add_data(u"foo", u"bar")
+        self.assertEqual(get_traversal(self.e).edges, traversal.edges)
+        self.assertEqual(len(get_traversal(new).edges),
+                         len(traversal.edges) + 1)
+
+    def test_compact_expression(self):
+        compact = make_expression(CompactExpression)
+        self.assertEqual(sorted(get_traversal(compact).edges),
+                         sorted(get_traversal(self.e).edges))
+
+
+if __name__ == "__main__":
+    unittest.main()
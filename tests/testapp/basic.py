@@ -34,6 +34,10 @@ class LowMatchAny(QuestionTemplate):
 
 
 class MatchAny(LowMatchAny):
+    """
+    Ex: "something something"
+    """
+
     weight = 0.8
 
     def interpret(self, match):
@@ -42,6 +46,10 @@ class MatchAny(LowMatchAny):
 
 
 class UserData(QuestionTemplate):
+    """
+    Ex: "user data"
+    """
+
     weight = 1.0
     regex = Token("user") + Token("data")
 
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) 2012, Machinalis S.R.L.
+# This file is part of quepy and is distributed under the Modified BSD License.
+# You should have received a copy of license in the LICENSE file.
+#
+# Authors: Rafael Carrascosa <rcarrascosa@machinalis.com>
+#          Gonzalo Garcia Berrotaran <ggarcia@machinalis.com>
+
+"""
+Tagger for the tests of testapp quepy that doesn't need the NLTK data.
+"""
+
+import quepy
+from quepy import settings
+from quepy.tagger import Word, Tagger
+
+TAGGER = u"testapp.tagging:split_tagger"
+
+
+def split_tagger(string):
+    """
+    Tags every word separated by whitespace as a noun that is its own lemma.
+    """
+    return [Word(x, x, u"NN") for x in string.split()]
+
+
+def install(cache=None):
+    """
+    Installs testapp quepy tagging with `split_tagger`.
+    """
+    app = quepy.install("testapp")
+    app.tagger = Tagger(split_tagger, cache)
+    return app
+
+
+def use_split_tagger(testcase):
+    """
+    Makes `split_tagger` the `TAGGER` setting until `testcase` finishes.
+    """
+    previous = settings.TAGGER
+    settings.TAGGER = TAGGER
+    testcase.addCleanup(setattr, settings, "TAGGER", previous)